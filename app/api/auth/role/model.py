@@ -8,5 +8,5 @@ class Role(Base):
     name = Column(String, unique=True, nullable=False)
     users = relationship("User", back_populates="role")
 
-    def __init__(self, name):
-        self.name = name.lower()
+    def __init__(self, name, **kwargs):
+        super().__init__(name=name.lower(), **kwargs)
@@ -1,4 +1,5 @@
 from .routes import login_for_access_token, get_user_profile,base_reset_password,base_forgot_password
+from .model import hash_user_passwords
 
 user = {
     "required_roles": {
@@ -14,5 +15,16 @@ user = {
         base_reset_password,
         base_forgot_password
 
-    ]
+    ],
+    "before_write": hash_user_passwords,
+    # Role lookups and joins go through the foreign key
+    "filterable": ["role_id"],
+    # Loaded only on request: include=role or fields=...,role.name
+    "includable": ["role"],
+    "search": {
+        "columns": {"username": "A", "email": "B"},
+        "trigram": ["username", "email"],
+    },
+    # Full-table exports hold a connection for their whole stream
+    "concurrency_limits": {"export": 2},
 }
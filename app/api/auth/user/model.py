@@ -1,7 +1,10 @@
+import asyncio
+from typing import List
 from sqlalchemy import Column, String, ForeignKey, event,Boolean
 from sqlalchemy.orm import relationship
 from app.core.database import Base
-from app.utils.security import get_password_hash
+from app.core.config import settings
+from app.utils.security import get_password_hash, get_password_hash_async, is_password_hash
 
 
 class User(Base):
@@ -13,14 +16,29 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     is_block = Column(Boolean, default=False, nullable=False)
     role_id = Column(String(24), ForeignKey("roles.documentId"), nullable=False)
-    role = relationship("Role", back_populates="users", lazy="joined")
+    # Not loaded implicitly (a lazy load cannot run under asyncio anyway);
+    # queries that need the role ask for it with joinedload or include=role
+    role = relationship("Role", back_populates="users", lazy="raise_on_sql")
 
+async def hash_user_passwords(rows: List[dict]):
+    """
+    `before_write` hook: hash plain passwords on the password thread pool
+    before rows reach the session, so the listeners below find them hashed.
+    """
+    for start in range(0, len(rows), settings.password_hash_workers):
+        chunk = [row for row in rows[start:start + settings.password_hash_workers]
+                 if row.get("password") and not is_password_hash(row["password"])]
+        hashes = await asyncio.gather(*(get_password_hash_async(row["password"]) for row in chunk))
+        for row, hashed in zip(chunk, hashes):
+            row["password"] = hashed
+
+# Safety net for writes that skip the hook; hashing here blocks the event loop
 @event.listens_for(User, "before_insert")
 def hash_user_password(mapper, connection, target):
-    if target.password:
+    if target.password and not is_password_hash(target.password):
         target.password = get_password_hash(target.password)
 
 @event.listens_for(User, "before_update")
 def hash_user_password(mapper, connection, target):
-    if target.password:
+    if target.password and not is_password_hash(target.password):
         target.password = get_password_hash(target.password)
\ No newline at end of file
@@ -2,14 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException,BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.utils.security import create_access_token, verify_password, get_user, TOKEN_EXPIRE_MINUTES, get_current_active_user_with_roles, create_reset_token,verify_reset_token
-from app.core.database import get_read_session,get_write_session
+from app.utils.security import create_access_token, verify_password_async, get_user, TOKEN_EXPIRE_MINUTES, get_current_active_user_with_roles, create_reset_token,verify_reset_token
+from app.core.database import get_read_session,get_write_session, read_only
 from pydantic import BaseModel
 from fastapi import status
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload
 from app.utils.email import send_email
-from app.utils.security import get_password_hash
+from app.utils.security import get_password_hash_async, invalidate_principal_cache
 from pydantic.networks import EmailStr
 
 
@@ -19,6 +20,7 @@ def login_for_access_token(router: APIRouter):
         password: str
 
     @router.post("/login")
+    @read_only
     async def login_for_access_token(
         login_data: LoginRequest,
         session: AsyncSession = Depends(get_read_session)
@@ -26,9 +28,10 @@ def login_for_access_token(router: APIRouter):
         from app.api.auth.user.model import User
         try:
             # Fetch the user based on username
-            result = await session.execute(select(User).where(User.email == login_data.email))
+            result = await session.execute(
+                select(User).options(joinedload(User.role)).where(User.email == login_data.email))
             user = result.scalar_one_or_none()
-            if not user or not verify_password(login_data.password, user.password):
+            if not user or not await verify_password_async(login_data.password, user.password):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Incorrect username or password",
@@ -54,6 +57,8 @@ def login_for_access_token(router: APIRouter):
                 "token_type": "bearer",  # Token type for HTTPBearer
                 "message":f"Welcome {user.username}!",
             }        
+        except HTTPException:
+                raise
         except SQLAlchemyError as e:
                 error_message = str(e).split("\n")[1]
                 raise HTTPException(status_code=400, detail=error_message)
@@ -84,6 +89,7 @@ def base_forgot_password(router: APIRouter):
         email: str
 
     @router.post("/forgot-password")
+    @read_only
     async def forgot_password(
         forgot_password_data: ForgotPasswordRequest,
         background_tasks: BackgroundTasks,
@@ -111,6 +117,8 @@ def base_forgot_password(router: APIRouter):
         except SQLAlchemyError as e:
             error_message = str(e).split("\n")[1]
             raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
@@ -145,13 +153,17 @@ def base_reset_password(router: APIRouter):
                 )
 
             # Update the user's password
-            user.password = reset_password_data.new_password
+            user.password = await get_password_hash_async(reset_password_data.new_password)
+            user_id = user.documentId
 
             # Commit changes
             await session.commit()
+            invalidate_principal_cache(User, user_id)
             session.refresh(user)
 
             return {"message": "Password successfully updated"}
+        except HTTPException:
+            raise
         except SQLAlchemyError as e:
             await session.rollback()
             raise HTTPException(status_code=400, detail=str(e))
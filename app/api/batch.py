@@ -0,0 +1,40 @@
+from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.config import settings
+from app.core.database import read_only
+from app.generator.serializers import RawJSONResponse, json_envelope
+from app.services.batch import BATCH_PATH, BATCH_PRINCIPAL, SubRequest, run_batch
+from app.utils.security import get_current_active_user, http_bearer
+import time
+
+router = APIRouter(tags=["Batch"])
+
+
+@router.post(BATCH_PATH)
+@read_only
+async def batch(
+    request: Request,
+    requests: List[SubRequest] = Body(..., embed=True),
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    current_user=Depends(get_current_active_user),
+):
+    """
+    Run several GET requests against the API in one round trip. Items are
+    `{"method": "GET", "path": "/api/users", "query": {...}}`; results come
+    back in order as `{"status", "time_ms", "body"}`. Authentication is
+    resolved once for the batch; each route still checks its own roles.
+    """
+    if not requests:
+        raise HTTPException(status_code=400, detail="No requests provided.")
+    if len(requests) > settings.batch_max_requests:
+        raise HTTPException(
+            status_code=400, detail=f"Too many requests. The maximum batch size is {settings.batch_max_requests}.")
+    started = time.perf_counter()
+    results = await run_batch(request.app, request.scope, requests,
+                              {BATCH_PRINCIPAL: (credentials.credentials, current_user)},
+                              settings.batch_max_concurrency)
+    return RawJSONResponse(json_envelope(b"[" + b",".join(results) + b"]", {
+        "count": len(results),
+        "time_ms": round((time.perf_counter() - started) * 1000, 2),
+    }))
@@ -0,0 +1,150 @@
+"""
+Admission control: reject requests up front with 503 + Retry-After while
+the database pools they would use are saturated, instead of letting them
+queue for a connection until pool_timeout.
+
+Routes fall into priority classes. Critical routes (health, metrics) are
+never shed, low priority routes (list, export, aggregate, bulk, batch-get)
+are shed at half the configured limits and everything else at the full
+limits.
+Generated routes can also carry a fixed concurrency limit from the
+`concurrency_limits` entry of their model config:
+
+    "concurrency_limits": {"export": 2, "read_all": 20},
+"""
+from collections import Counter
+from typing import Callable, Dict, Optional
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+from app.core.config import settings
+from app.core.database import master_db_engine, read_session_factory, is_write_request
+from app.core.metrics import ADMISSION_REJECTIONS
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+
+# Priority by endpoint name; unmatched and custom routes are NORMAL
+ROUTE_PRIORITIES = {
+    "health_check": CRITICAL,
+    "read_root": CRITICAL,
+    "get_metrics": CRITICAL,
+    "read_all": LOW,
+    "export": LOW,
+    "aggregate": LOW,
+    "bulk_create": LOW,
+    "bulk_update_items": LOW,
+    "bulk_delete_items": LOW,
+    "batch_get": LOW,
+}
+
+# Fraction of each limit at which a priority class starts being shed
+SHED_AT = {NORMAL: 1.0, LOW: 0.5}
+
+
+class RouteLimit:
+    __slots__ = ("limit", "active")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+
+
+# Per-endpoint concurrency limits; endpoints are shared by the copies of a
+# route that include_router makes, so they identify the route
+route_limits: Dict[Callable, RouteLimit] = {}
+
+
+def register_route_limits(router, limits: Dict[str, int]) -> None:
+    """Attach `concurrency_limits` (by route name) to a generated router's endpoints."""
+    names = {route.name for route in router.routes}
+    for name in limits:
+        if name not in names:
+            raise ValueError(f"Unknown route '{name}' in concurrency_limits")
+    for route in router.routes:
+        if route.name in limits:
+            route_limits[route.endpoint] = RouteLimit(limits[route.name])
+
+
+def pool_pressure(engine) -> float:
+    """
+    How close an engine's pool is to its limits, 1.0 being at a limit:
+    the moving average checkout wait and the number of waiting checkouts.
+    """
+    pool = engine.pool
+    return max(getattr(pool, "avg_wait", 0.0) / settings.admission_max_pool_wait,
+               getattr(pool, "waiting", 0) / settings.admission_max_pool_waiters)
+
+
+def target_engine(scope, route):
+    """
+    The engine a request will use: the master for writes, else the pool
+    read_session_factory picks, which it keeps for the rest of the request.
+    POST routes marked `read_only` (login, batch-get) count as reads.
+    """
+    if is_write_request(scope["method"], getattr(route, "endpoint", None)):
+        return master_db_engine
+    return read_session_factory(Request(scope)).kw["bind"]
+
+
+def overloaded(retry_after: int, detail: str) -> JSONResponse:
+    return JSONResponse(status_code=503, headers={"Retry-After": str(retry_after)},
+                        content={"message": detail, "status": False})
+
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware that matches the route itself (routing has not run
+    yet) to find its priority and concurrency limit. Requests in flight are
+    counted per engine, so a busy replica does not shed writes to the master.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+        self.in_flight = Counter()
+
+    def match(self, scope):
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    def rejection(self, scope, route, priority: str, engine) -> Optional[str]:
+        limit = route_limits.get(getattr(route, "endpoint", None))
+        if limit is not None and limit.active >= limit.limit:
+            return "route_limit"
+        if priority == CRITICAL:
+            return None
+        shed_at = SHED_AT[priority]
+        if self.in_flight[engine] >= settings.admission_max_in_flight * shed_at:
+            return "in_flight"
+        if pool_pressure(engine) >= shed_at:
+            return "pool"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.admission_enabled:
+            return await self.app(scope, receive, send)
+
+        route = self.match(scope)
+        name = getattr(route, "name", None)
+        priority = ROUTE_PRIORITIES.get(name, NORMAL)
+        engine = target_engine(scope, route)
+        reason = self.rejection(scope, route, priority, engine)
+        if reason is not None:
+            ADMISSION_REJECTIONS.labels(reason, priority).inc()
+            response = overloaded(settings.admission_retry_after,
+                                  "Server is busy, please retry shortly")
+            return await response(scope, receive, send)
+
+        limit = route_limits.get(getattr(route, "endpoint", None))
+        self.in_flight[engine] += 1
+        if limit is not None:
+            limit.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[engine] -= 1
+            if limit is not None:
+                limit.active -= 1
@@ -1,3 +1,4 @@
+from typing import List
 from pydantic_settings import BaseSettings  # Corrected import
 
 
@@ -6,6 +7,90 @@ class Settings(BaseSettings):
     postgresql_database_slave_url: str
     secret_key: str
 
+    # Extra read replicas (JSON lists), balanced together with the slave URL
+    postgresql_database_replica_urls: List[str] = []
+    postgresql_database_replica_weights: List[int] = []
+    replica_balancing: str = "weighted"  # "weighted" or "least_connections"
+    replica_max_lag_seconds: float = 5
+    replica_probe_interval: float = 5
+    # Pin a client's reads to the master for this long after it writes (0 disables)
+    read_your_writes_seconds: float = 5
+    # SameSite of the pin cookie; "none" (sent as Secure) for frontends on another origin
+    read_your_writes_samesite: str = "lax"
+
+    # documentId generator for new rows: "random" or "time_ordered" (sorts by
+    # creation time, so inserts stay local in the documentId index)
+    document_id_generator: str = "random"
+
+    # Resolved-principal cache used by get_current_user; workers share
+    # invalidations over LISTEN/NOTIFY, the TTL bounds writes made outside the API
+    principal_cache_enabled: bool = True
+    principal_cache_ttl: float = 5
+    principal_cache_maxsize: int = 10000
+
+    # Threads hashing/verifying passwords and how many calls may queue for them
+    password_hash_workers: int = 4
+    password_hash_queue_size: int = 64
+
+    # Default maximum number of items accepted by the generated /bulk routes
+    bulk_max_items: int = 1000
+
+    # Per-request query profiling (Server-Timing headers, slow query and N+1 logs)
+    query_profiling_enabled: bool = True
+    slow_query_ms: float = 200
+    n_plus_one_threshold: int = 10
+
+    # Rows fetched per round trip by the streaming /export routes
+    export_fetch_size: int = 1000
+
+    # ETag / Last-Modified validators and 304 responses on generated read routes;
+    # models can opt out with `conditional_get` in their config
+    conditional_get: bool = True
+
+    # Startup comparison of declared indexes (and the extensions they need)
+    # with the catalog: off, report or create (development only); strict mode rejects filters and sorts on
+    # columns a model does not declare
+    index_check: str = "report"
+    strict_query_fields: bool = False
+
+    # Default text search configuration for models with a `search` config
+    search_language: str = "simple"
+
+    # Timezone of the day/week/month buckets of the /aggregate routes
+    aggregate_timezone: str = "Asia/Kolkata"
+
+    # Admission control: shed requests with 503 once the requests in flight on
+    # an engine or its pool (average checkout wait in seconds, checkouts
+    # waiting) reach these limits; low priority routes at half of them
+    admission_enabled: bool = True
+    admission_max_in_flight: int = 500
+    admission_max_pool_wait: float = 0.5
+    admission_max_pool_waiters: int = 20
+    admission_retry_after: int = 1
+
+    # Share one execution between identical concurrent reads (read_all/read_one);
+    # models opt in or out with `single_flight` in their config
+    single_flight: bool = False
+
+    # Outgoing mail: workers each keep one SMTP connection open, sending up to
+    # mail_batch_size queued messages per wake-up; failures back off exponentially
+    mail_workers: int = 2
+    mail_batch_size: int = 20
+    mail_queue_size: int = 10000
+    mail_max_retries: int = 5
+    mail_retry_backoff: float = 2
+    mail_idle_timeout: float = 30
+
+    # Group commit of single-row creates for models with `group_commit` in their
+    # config: rows arriving within the window (or up to max_batch) share one
+    # INSERT and one transaction
+    group_commit_window_ms: float = 3
+    group_commit_max_batch: int = 100
+
+    # POST /api/_batch: sub-requests accepted per batch and run at once
+    batch_max_requests: int = 20
+    batch_max_concurrency: int = 4
+
     class Config:
         env_file = ".env"
 
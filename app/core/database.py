@@ -2,23 +2,100 @@ from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
 from fastapi import Request
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Set
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, DateTime, func, text
 from sqlalchemy.ext.declarative import as_declarative
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from math import ceil, exp
+import asyncio
+import hashlib
+import hmac
+import random
+import threading
+import time
 import uuid
 
 Base = declarative_base()
 
 
+def random_document_id() -> str:
+    return uuid.uuid4().hex[:24]
+
+
+class TimeOrderedIds:
+    """
+    24 hex characters: 12 of Unix time in milliseconds, then 12 of a
+    sequence started at a random value each millisecond and incremented
+    within it. IDs sort by creation time, so inserts append to the right
+    edge of the documentId index instead of splitting pages all over it,
+    and they fit the existing String(24) columns. Within a process they
+    are strictly increasing, even if the clock steps back.
+    """
+
+    # Random start below 2**47, leaving half the sequence space for increments
+    SEED_BITS = 47
+    SEQUENCE_MAX = 2 ** 48 - 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._millis = 0
+        self._sequence = 0
+
+    def __call__(self) -> str:
+        with self._lock:
+            millis = time.time_ns() // 1_000_000
+            if millis > self._millis:
+                self._millis = millis
+                self._sequence = random.getrandbits(self.SEED_BITS)
+            elif self._sequence < self.SEQUENCE_MAX:
+                self._sequence += 1
+            else:
+                # Sequence exhausted within one millisecond: borrow the next one
+                self._millis += 1
+                self._sequence = random.getrandbits(self.SEED_BITS)
+            return f"{self._millis:012x}{self._sequence:012x}"
+
+
+time_ordered_document_id = TimeOrderedIds()
+
+# documentId generators by `document_id_generator` setting name
+document_id_generators: Dict[str, Callable[[], str]] = {
+    "random": random_document_id,
+    "time_ordered": time_ordered_document_id,
+}
+
+
+def register_document_id_generator(name: str, generator: Callable[[], str]) -> None:
+    """Add a generator selectable through `document_id_generator`; IDs must fit String(24)."""
+    document_id_generators[name] = generator
+
+
+def document_id_generator() -> Callable[[], str]:
+    """
+    The generator the `document_id_generator` setting names. Checked at
+    startup, once generators registered by the app's modules are in place.
+    """
+    generator = document_id_generators.get(settings.document_id_generator)
+    if generator is None:
+        raise ValueError(
+            f"Unknown document_id_generator '{settings.document_id_generator}'; "
+            f"use one of {', '.join(document_id_generators)}")
+    return generator
+
+
+def new_document_id() -> str:
+    return document_id_generator()()
+
+
 @as_declarative()
 class Base:
     """
     Base model to include default columns for all tables.
     """
     id = Column(Integer, primary_key=True, index=True)
-    documentId = Column(String(24), nullable=False,
-                        default=lambda: str(uuid.uuid4().hex)[:24])
+    documentId = Column(String(24), nullable=False, unique=True, index=True,
+                        default=new_document_id)
     createdAt = Column(DateTime, nullable=False, server_default=func.now())
     updatedAt = Column(DateTime, nullable=False,
                        server_default=func.now(), onupdate=func.now())
@@ -26,35 +103,293 @@ class Base:
     updatedBy = Column(String, nullable=True)  # Track the updater
 
 
-def create_engine(url, **kwargs):
+# Callbacks receiving (engine name, seconds) for every pool checkout
+pool_wait_listeners: List[Callable[[str, float], None]] = []
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that measures how long each checkout waited for a connection
+    (including connecting when the pool grows) and keeps a moving average,
+    along with the number of checkouts currently waiting. The average also
+    decays with time since the last checkout, so it recovers while no
+    requests get through (e.g. while admission control sheds them all).
+    """
+
+    # Seconds for the average to decay by 1/e without checkouts
+    wait_decay = 2.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._avg_wait = 0.0
+        self._avg_wait_at = time.monotonic()
+        self.waiting = 0
+
+    def _decayed_wait(self, now: float) -> float:
+        return self._avg_wait * exp(-(now - self._avg_wait_at) / self.wait_decay)
+
+    @property
+    def avg_wait(self) -> float:
+        return self._decayed_wait(time.monotonic())
+
+    def _do_get(self):
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            self.waiting -= 1
+            waited = time.perf_counter() - start
+            now = time.monotonic()
+            average = self._decayed_wait(now)
+            self._avg_wait = average + (waited - average) * 0.1
+            self._avg_wait_at = now
+            for listener in pool_wait_listeners:
+                listener(self._orig_logging_name, waited)
+
+
+def create_engine(url, name: str = "master", **kwargs):
     """Create an asynchronous SQLAlchemy engine."""
-    return create_async_engine(url, echo=False, **kwargs)
+    return create_async_engine(url, echo=False, poolclass=InstrumentedQueuePool,
+                               pool_logging_name=name, **kwargs)
+
+
+REPLICA_POOL_OPTIONS = dict(
+    pool_size=20, max_overflow=10, pool_recycle=3600, pool_timeout=30, pool_pre_ping=True)
+
+# Seconds a replica is behind the master; 0 on a primary or a caught-up replica
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+READ_PIN_COOKIE = "db_read_pin"
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Endpoints that only read although their method is in WRITE_METHODS
+read_only_endpoints: Set[Callable] = set()
+
+
+def read_only(endpoint: Callable) -> Callable:
+    """
+    Mark an endpoint that only reads (e.g. a POST taking its query in the
+    body), so its auth lookup and admission control use the read pools.
+    Apply it under the route decorator.
+    """
+    read_only_endpoints.add(endpoint)
+    return endpoint
 
 
-master_db_engine = create_engine(settings.postgresql_database_master_url)
-slave_db_engine = create_engine(
-    settings.postgresql_database_slave_url,
-    pool_size=20, max_overflow=10, pool_recycle=3600,pool_timeout=30, pool_pre_ping=True
+def is_write_request(method: str, endpoint: Optional[Callable]) -> bool:
+    return method in WRITE_METHODS and endpoint not in read_only_endpoints
+
+
+class Replica:
+    def __init__(self, name: str, url: str, weight: int = 1):
+        self.name = name
+        self.weight = max(weight, 0)
+        self.engine = create_engine(url, name=name, **REPLICA_POOL_OPTIONS)
+        self.session = async_sessionmaker(
+            bind=self.engine, autocommit=False, autoflush=False)
+        self.healthy = True
+        self.lag: Optional[float] = None
+
+
+class ReplicaSet:
+    """
+    Read replicas with weighted or least-connections balancing.
+    A background probe measures replication lag and ejects replicas that
+    are unreachable or lag more than `max_lag` seconds; when none are
+    healthy, reads go to the master.
+    """
+
+    def __init__(self, replicas: List[Replica], strategy: str = "weighted",
+                 max_lag: float = 5, probe_interval: float = 5):
+        if strategy not in ("weighted", "least_connections"):
+            raise ValueError(f"Invalid replica balancing strategy '{strategy}'")
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.probe_interval = probe_interval
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def choose(self) -> Optional[Replica]:
+        candidates = [replica for replica in self.replicas if replica.healthy and replica.weight]
+        if not candidates:
+            return None
+        if self.strategy == "least_connections":
+            return min(candidates, key=lambda replica: replica.engine.pool.checkedout() / replica.weight)
+        return random.choices(candidates, weights=[replica.weight for replica in candidates])[0]
+
+    async def probe(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                lag = await asyncio.wait_for(
+                    conn.scalar(REPLICA_LAG_QUERY), timeout=self.probe_interval)
+            replica.lag = float(lag or 0)
+            replica.healthy = replica.lag <= self.max_lag
+        except Exception:
+            replica.lag = None
+            replica.healthy = False
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self.probe(replica) for replica in self.replicas))
+
+    async def _run_probes(self) -> None:
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self) -> None:
+        if self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._run_probes())
+
+    async def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+master_db_engine = create_engine(settings.postgresql_database_master_url, name="master")
+
+replica_weights = settings.postgresql_database_replica_weights
+replica_set = ReplicaSet(
+    [
+        Replica(f"replica{index}", url,
+                replica_weights[index] if index < len(replica_weights) else 1)
+        for index, url in enumerate(
+            [settings.postgresql_database_slave_url, *settings.postgresql_database_replica_urls])
+    ],
+    strategy=settings.replica_balancing,
+    max_lag=settings.replica_max_lag_seconds,
+    probe_interval=settings.replica_probe_interval,
 )
+slave_db_engine = replica_set.replicas[0].engine
+
+
+def all_engines() -> dict:
+    """Every engine by name: the master and each replica."""
+    return {"master": master_db_engine,
+            **{replica.name: replica.engine for replica in replica_set.replicas}}
 
 # Async session factories
 async_master_session = async_sessionmaker(
     bind=master_db_engine, autocommit=False, autoflush=False)
-async_slave_session = async_sessionmaker(
-    bind=slave_db_engine, autocommit=False, autoflush=False)
+async_slave_session = replica_set.replicas[0].session
+
+
+def read_pin_signature(pin_until: str) -> str:
+    return hmac.new(settings.secret_key.encode(), f"{READ_PIN_COOKIE}:{pin_until}".encode(),
+                    hashlib.sha256).hexdigest()
 
 
-async def get_write_session() -> AsyncGenerator[AsyncSession, None]:
+def read_pin_cookie_value(pin_until: float) -> str:
+    """`<expiry>.<hmac>`: clients can't forge or extend their own pin."""
+    expiry = f"{pin_until:.3f}"
+    return f"{expiry}.{read_pin_signature(expiry)}"
+
+
+def is_pinned_to_master(request: Optional[Request]) -> bool:
+    """True while the client is inside its read-your-writes window."""
+    if request is None or not settings.read_your_writes_seconds:
+        return False
+    expiry, _, signature = request.cookies.get(READ_PIN_COOKIE, "").rpartition(".")
+    if not expiry or not hmac.compare_digest(signature, read_pin_signature(expiry)):
+        return False
+    try:
+        pin_until = float(expiry)
+    except ValueError:
+        return False
+    now = time.time()
+    # Capped in case the window was shortened since the cookie was issued
+    return now < pin_until <= now + settings.read_your_writes_seconds
+
+
+def read_session_factory(request: Optional[Request] = None) -> async_sessionmaker:
+    """
+    Pick the session factory for a read: the master while the client is
+    pinned after a write or when no replica is healthy, else a replica.
+    The choice is kept for the rest of the request, so auth and the handler
+    use the same pool.
+    """
+    factory = getattr(request.state, "read_session_factory", None) if request is not None else None
+    if factory is not None:
+        return factory
+    if is_pinned_to_master(request):
+        factory = async_master_session
+    else:
+        replica = replica_set.choose()
+        factory = replica.session if replica else async_master_session
+    if request is not None:
+        request.state.read_session_factory = factory
+    return factory
+
+
+def auth_session_factory(request: Request) -> async_sessionmaker:
+    """
+    Session factory for the auth lookup: the master for write requests, so a
+    write only ever checks out master connections, else the read factory.
+    """
+    if is_write_request(request.method, request.scope.get("endpoint")):
+        return async_master_session
+    return read_session_factory(request)
+
+
+async def get_write_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency to provide a database session.
+    Also starts the client's read-your-writes window.
     """
+    if settings.read_your_writes_seconds:
+        request.state.read_pin_until = time.time() + settings.read_your_writes_seconds
     async with async_master_session() as session:
         yield session
 
 
-async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+class ReadYourWritesMiddleware:
+    """
+    Sets the read-your-writes cookie on responses to requests that opened a
+    write session. Done at the ASGI level because routes return Response
+    objects directly, which dependencies can't add headers to.
+    """
+
+    def __init__(self, app, samesite: str = settings.read_your_writes_samesite):
+        if samesite not in ("lax", "strict", "none"):
+            raise ValueError(f"Invalid read-your-writes cookie SameSite '{samesite}'")
+        self.app = app
+        # Browsers only accept SameSite=None on Secure cookies
+        self.attributes = f"HttpOnly; Path=/; SameSite={samesite}" + ("; Secure" if samesite == "none" else "")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start":
+                pin_until = scope.get("state", {}).get("read_pin_until")
+                if pin_until:
+                    cookie = (f"{READ_PIN_COOKIE}={read_pin_cookie_value(pin_until)}; Max-Age="
+                              f"{int(ceil(settings.read_your_writes_seconds))}; {self.attributes}")
+                    message["headers"] = [*message.get("headers", []),
+                                          (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency to provide a database session.
     """
-    async with async_slave_session() as session:
+    async with read_session_factory(request)() as session:
         yield session
@@ -0,0 +1,171 @@
+"""
+Declarative secondary indexes from model_configs, and a startup check that
+compares them against the live catalog.
+
+    "filterable": ["email", "role_id"],     # one B-tree per column
+    "sortable": ["name"],                   # (column, id) for ORDER BY and keyset seeks
+    "indexes": [                            # composite, partial or unique extras
+        {"columns": ["role_id", "createdAt"]},
+        {"columns": ["email"], "where": "is_active", "unique": True},
+    ],
+    "strict_fields": True,                  # reject filters/sorts on undeclared columns
+
+`createdAt` is always sortable since it is the default sort of read_all.
+Full-text and trigram GIN indexes come from the `search` entry, see
+app/services/search.py.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Index, PrimaryKeyConstraint, UniqueConstraint, inspect, text
+from sqlalchemy.schema import CreateIndex
+from app.services.search import register_search
+
+logger = logging.getLogger(__name__)
+
+INDEX_CHECK_MODES = ("off", "report", "create")
+
+DEFAULT_SORTABLE = ("createdAt",)
+
+# Extensions the declared indexes depend on (named by `Index.info["extension"]`),
+# with the indexes that need each one
+required_extensions: Dict[str, List[Index]] = {}
+
+
+def index_name(table, columns: List[str], where: Optional[str] = None) -> str:
+    name = "ix_" + "_".join([table.name, *columns])
+    return name + "_partial" if where else name
+
+
+def _leading_columns(table) -> set:
+    """Columns that already lead a full (non-partial) index or unique constraint."""
+    leading = {column.name for column in table.columns if column.index or column.unique or column.primary_key}
+    for index in table.indexes:
+        if not index.dialect_options["postgresql"].get("where"):
+            leading.add(getattr(index.expressions[0], "name", None))
+    # Foreign keys are not indexed by PostgreSQL, only these constraints are
+    for constraint in table.constraints:
+        if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint)) and len(constraint.columns):
+            leading.add(list(constraint.columns)[0].name)
+    return leading
+
+
+def _add_index(table, columns: List[str], where: Optional[str] = None,
+               unique: bool = False, name: Optional[str] = None) -> Index:
+    for column in columns:
+        if column not in table.c:
+            raise ValueError(f"Unknown column '{column}' in index declaration for '{table.name}'")
+    name = name or index_name(table, columns, where)
+    for index in table.indexes:
+        if index.name == name:
+            return index
+    # Creating the Index attaches it to the table, so create_all picks it up
+    return Index(name, *[table.c[column] for column in columns], unique=unique,
+                 postgresql_where=text(where) if where else None)
+
+
+def declare_indexes(model, config: dict) -> List[Index]:
+    """
+    Attach the indexes declared in a model config to the model's table.
+    Columns already covered by a leading index column are skipped.
+    """
+    table = model.__table__
+    declared = []
+    for column in config.get("filterable", []):
+        if column not in _leading_columns(table):
+            declared.append(_add_index(table, [column]))
+    for column in [*DEFAULT_SORTABLE, *config.get("sortable", [])]:
+        if column != "id":
+            declared.append(_add_index(table, [column, "id"]))
+    for spec in config.get("indexes", []):
+        declared.append(_add_index(table, list(spec["columns"]), spec.get("where"),
+                                   spec.get("unique", False), spec.get("name")))
+    search = register_search(model, config)
+    if search is not None:
+        declared.extend(search.indexes())
+    for index in declared:
+        extension = index.info.get("extension")
+        if extension:
+            required_extensions.setdefault(extension, []).append(index)
+    return declared
+
+
+def ensure_extensions(connection, mode: str = "report") -> List[str]:
+    """
+    Check the extensions the declared indexes need, before the tables are
+    created. `create` runs `CREATE EXTENSION` for the missing ones. In the
+    other modes the indexes that need a missing extension are taken off
+    their tables, so create_all can still build the tables, and logged.
+    Returns the missing extensions.
+    """
+    if mode not in INDEX_CHECK_MODES:
+        raise ValueError(f"Invalid index check mode '{mode}'; use one of {INDEX_CHECK_MODES}")
+    if not required_extensions:
+        return []
+    installed = set(connection.execute(text("SELECT extname FROM pg_extension")).scalars())
+    missing = sorted(set(required_extensions) - installed)
+    for extension in missing:
+        ddl = f'CREATE EXTENSION IF NOT EXISTS "{extension}"'
+        if mode == "create":
+            connection.execute(text(ddl))
+            logger.info("Created extension %s", extension)
+            continue
+        logger.warning("Missing extension %s required by declared indexes: %s", extension, ddl)
+        for index in required_extensions[extension]:
+            index.table.indexes.discard(index)
+            logger.warning("Skipping index %s on %s until %s is installed",
+                           index.name, index.table.name, extension)
+    return missing
+
+
+def query_field_whitelist(model, config: dict, strict: bool) -> Tuple[Optional[set], Optional[set]]:
+    """
+    (filterable, sortable) column names for strict mode, or (None, None)
+    when any column may be used. Columns leading an index are always allowed.
+    """
+    if not config.get("strict_fields", strict):
+        return None, None
+    indexed = _leading_columns(model.__table__)
+    sortable = {"id", *DEFAULT_SORTABLE, *config.get("sortable", [])}
+    filterable = indexed | sortable | set(config.get("filterable", []))
+    return filterable, sortable
+
+
+def _missing_indexes(connection, tables) -> List[Index]:
+    inspector = inspect(connection)
+    missing = []
+    for table in tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        existing |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+async def verify_indexes(engine, tables, mode: str = "report") -> List[Index]:
+    """
+    Compare declared indexes with the live catalog. `report` logs the DDL
+    of each missing index; `create` also builds it (meant for development,
+    as a plain CREATE INDEX locks writes on large tables).
+    Returns the indexes that were missing.
+    """
+    if mode not in INDEX_CHECK_MODES:
+        raise ValueError(f"Invalid index check mode '{mode}'; use one of {INDEX_CHECK_MODES}")
+    if mode == "off":
+        return []
+
+    async with engine.connect() as conn:
+        missing = await conn.run_sync(_missing_indexes, tables)
+
+    for index in missing:
+        ddl = str(CreateIndex(index).compile(dialect=engine.dialect))
+        if mode == "report":
+            logger.warning("Missing index %s on %s: %s", index.name, index.table.name, ddl)
+            continue
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(CreateIndex(index, if_not_exists=True))
+            logger.info("Created index %s on %s", index.name, index.table.name)
+        except Exception as e:
+            logger.error("Could not create index %s on %s: %s", index.name, index.table.name, e)
+    return missing
@@ -0,0 +1,203 @@
+"""
+Prometheus instrumentation: HTTP middleware, SQLAlchemy engine and pool
+hooks, and collectors for the in-process caches. Everything on the hot path
+is a dictionary lookup plus a counter/histogram update; gauges that need
+computation (pool and cache stats) are read only when /metrics is scraped.
+"""
+import time
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+from sqlalchemy import event
+from app.core.database import all_engines, pool_wait_listeners
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route, generated model and CRUD operation",
+    ["method", "route", "model", "operation", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing SQL statements",
+    ["engine"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    ["engine"],
+    buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 10, 30),
+)
+DB_POOL_HOLD = Histogram(
+    "db_pool_hold_seconds",
+    "Time a pooled connection stays checked out",
+    ["engine"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+AUTH_FAILURES = Counter(
+    "auth_failures_total",
+    "Rejected authentication or authorization attempts",
+    ["reason"],
+)
+FILTER_PARSE_ERRORS = Counter(
+    "filter_parse_errors_total",
+    "Filters rejected by the filter parser",
+    ["model"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests shed by admission control",
+    ["reason", "priority"],
+)
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "single_flight_requests_total",
+    "Coalesced read requests: executed once, or served from an in-flight execution",
+    ["model", "result"],
+)
+GROUP_COMMIT_BATCH_SIZE = Histogram(
+    "group_commit_batch_rows",
+    "Rows written per group commit of single-row creates; sum/count is the average batch size",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+GROUP_COMMIT_FALLBACKS = Counter(
+    "group_commit_fallbacks_total",
+    "Group commits whose batch insert failed and were retried row by row",
+    ["model"],
+)
+MAIL_QUEUE_DEPTH = Gauge(
+    "mail_queue_depth",
+    "Outgoing emails waiting for an SMTP connection",
+)
+MAIL_DELIVERY_LATENCY = Histogram(
+    "mail_delivery_seconds",
+    "Time from enqueueing an email to its acceptance by the SMTP server",
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+MAIL_MESSAGES = Counter(
+    "mail_messages_total",
+    "Outgoing emails by outcome",
+    ["result"],
+)
+
+
+class PrometheusMiddleware:
+    """
+    Pure ASGI middleware recording latency per matched route. The model and
+    operation labels come from the generated router's tag and endpoint name.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            if route is not None:
+                tags = getattr(route, "tags", None)
+                labels = (scope["method"], route.path,
+                          tags[0] if tags else "", getattr(route, "name", ""), str(status))
+            else:
+                # Unmatched paths share one label set to bound cardinality
+                labels = (scope["method"], "unmatched", "", "", str(status))
+            REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def instrument_engine(name: str, engine) -> None:
+    """Record per-statement execution time and connection hold time for `engine`."""
+    histogram = DB_STATEMENT_DURATION.labels(name)
+    hold = DB_POOL_HOLD.labels(name)
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        histogram.observe(time.perf_counter() - context._metrics_start)
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["_metrics_checkout"] = time.perf_counter()
+
+    def checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("_metrics_checkout", None)
+        if started is not None:
+            hold.observe(time.perf_counter() - started)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine.sync_engine.pool, "checkout", checkout)
+    event.listen(engine.sync_engine.pool, "checkin", checkin)
+
+
+class StatsCollector:
+    """Pool and cache statistics, computed at scrape time."""
+
+    def collect(self):
+        checked_out = GaugeMetricFamily(
+            "db_pool_checked_out", "Connections currently checked out", labels=["engine"])
+        overflow = GaugeMetricFamily(
+            "db_pool_overflow", "Connections open beyond pool_size", labels=["engine"])
+        size = GaugeMetricFamily(
+            "db_pool_size", "Configured pool size", labels=["engine"])
+        waiting = GaugeMetricFamily(
+            "db_pool_waiting", "Checkouts currently waiting for a connection", labels=["engine"])
+        for name, engine in all_engines().items():
+            pool = engine.pool
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+            size.add_metric([name], pool.size())
+            waiting.add_metric([name], getattr(pool, "waiting", 0))
+        yield checked_out
+        yield overflow
+        yield size
+        yield waiting
+
+        # Local imports: these modules import this one for their counters
+        from app.utils.security import principal_cache
+        from app.services.filtering import filter_plan_cache
+        from app.services.pagination import count_cache
+
+        caches = {"principal": principal_cache, "filter_plan": filter_plan_cache, "count": count_cache}
+        lookups = CounterMetricFamily(
+            "cache_lookups", "In-process cache lookups", labels=["cache", "result"])
+        evictions = CounterMetricFamily(
+            "cache_evictions", "In-process cache evictions", labels=["cache"])
+        entries = GaugeMetricFamily(
+            "cache_entries", "In-process cache entries", labels=["cache"])
+        for name, cache in caches.items():
+            stats = cache.stats()
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            evictions.add_metric([name], stats["evictions"])
+            entries.add_metric([name], stats["size"])
+        yield lookups
+        yield evictions
+        yield entries
+
+
+def setup_metrics() -> None:
+    """Attach engine and pool instrumentation and register the collectors."""
+    for name, engine in all_engines().items():
+        instrument_engine(name, engine)
+    pool_wait_listeners.append(
+        lambda name, seconds: DB_POOL_CHECKOUT_WAIT.labels(name).observe(seconds))
+    REGISTRY.register(StatsCollector())
@@ -0,0 +1,151 @@
+"""
+Request-scoped SQL profiling. Every statement executed while serving a
+request is attributed to it through a context variable; the totals are sent
+back as `Server-Timing` headers, slow statements are logged with the route
+that issued them, and repeated statement shapes are flagged as likely N+1
+query patterns. Connection hold time (checkout to checkin) is reported
+alongside, since a connection held across slow application code starves the
+pool as surely as a slow query.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.database import all_engines
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace, placeholders and expanded IN lists into one shape."""
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("?", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class RequestProfile:
+    __slots__ = ("scope", "statements", "db_time", "slowest", "slowest_sql", "shapes", "hold_time")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.shapes = Counter()
+        self.hold_time = 0.0
+
+    @property
+    def route(self) -> str:
+        # The matched route is known once routing has run
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {route.path if route else self.scope['path']}"
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements += 1
+        self.db_time += elapsed
+        self.shapes[statement] += 1
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+            self.slowest_sql = statement
+        if elapsed * 1000 >= settings.slow_query_ms:
+            logger.warning("Slow query (%.1f ms) on %s: %s",
+                           elapsed * 1000, self.route, normalize_sql(statement))
+
+    def repeated_statement(self):
+        """The most repeated statement shape and its count, or (None, 0)."""
+        if not self.shapes:
+            return None, 0
+        statement, count = self.shapes.most_common(1)[0]
+        return statement, count
+
+    def server_timing(self) -> str:
+        timings = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.statements} queries"',
+            f"db-slowest;dur={self.slowest * 1000:.2f}",
+            f"db-hold;dur={self.hold_time * 1000:.2f}",
+        ]
+        statement, count = self.repeated_statement()
+        if count > settings.n_plus_one_threshold:
+            timings.append(f'n-plus-one;desc="{count} repeats"')
+        return ", ".join(timings)
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+class QueryProfilingMiddleware:
+    """
+    Pure ASGI middleware that opens a RequestProfile per HTTP request and
+    adds its Server-Timing header to the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope)
+        token = current_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []),
+                                      (b"server-timing", profile.server_timing().encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            if profile.statements:
+                logger.debug("%s: %d queries in %.1f ms, slowest %.1f ms: %s",
+                             profile.route, profile.statements, profile.db_time * 1000,
+                             profile.slowest * 1000, normalize_sql(profile.slowest_sql))
+            statement, count = profile.repeated_statement()
+            if count > settings.n_plus_one_threshold:
+                logger.warning("Possible N+1 on %s: statement ran %d times: %s",
+                               profile.route, count, normalize_sql(statement))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._profile_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, time.perf_counter() - context._profile_start)
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    # Keep the profile with the connection: checkin may run outside the request context
+    profile = current_profile.get()
+    if profile is not None:
+        connection_record.info["_profile_checkout"] = (profile, time.perf_counter())
+
+
+def _checkin(dbapi_connection, connection_record):
+    checkout = connection_record.info.pop("_profile_checkout", None)
+    if checkout is not None:
+        profile, started = checkout
+        profile.hold_time += time.perf_counter() - started
+
+
+def setup_profiling() -> None:
+    """Attach the statement and pool hooks to every engine."""
+    for engine in all_engines().values():
+        event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine.sync_engine.pool, "checkout", _checkout)
+        event.listen(engine.sync_engine.pool, "checkin", _checkin)
@@ -42,4 +42,6 @@ def http_exception_handlers(app: FastAPI):
                 "message": detail,  # Use the detail directly as the message
                 "status": False
             },
+            # Retry-After on 503s, WWW-Authenticate on 401s
+            headers=getattr(exc, "headers", None),
         )
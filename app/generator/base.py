@@ -1,13 +1,28 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Body, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_read_session,get_write_session
-from typing import Type, Optional, Dict, List, Callable
-from app.services.filtering import parse_filters
+from app.core.database import get_read_session,get_write_session, read_session_factory, is_pinned_to_master, read_only
+from app.core.config import settings
+from app.core.admission import register_route_limits
+from typing import Type, Optional, Dict, List, Callable, Any, Awaitable, Union
+from app.services.filtering import compile_filters
+from app.services.search import SEARCH_PARAM, get_search_config
+from app.services.relations import parse_include, loader_options, projected_columns
+from app.services.dataloader import fetch_by_document_ids
+from app.services.group_commit import WriteBatcher
+from app.services.aggregation import parse_group_by, parse_metrics, build_aggregate_query, compact_rows, DEFAULT_AGGREGATABLE
+from app.generator.serializers import ResponseSerializer, RawJSONResponse, json_envelope
+from app.services.export import stream_export, EXPORT_FORMATS
+from app.services.singleflight import SingleFlight, clone_response
+from app.services.bulk import validate_items, bulk_insert, bulk_update, bulk_delete, update_one, delete_one
+from app.services.pagination import encode_cursor, decode_cursor, keyset_condition, count_records, normalize_filters, COUNT_STRATEGIES
+from app.services.conditional import (make_etag, validator_headers, has_conditional_headers, is_not_modified,
+                                      not_modified, variant_key, row_validator, set_validator)
 from sqlalchemy.future import select
-from sqlalchemy import asc, desc, func
+from sqlalchemy import asc, desc
 from sqlalchemy.exc import SQLAlchemyError
 import json
-from app.utils.security import get_current_active_user_with_roles
+from app.utils.security import get_current_active_user_with_roles, invalidate_principal_cache
 from math import ceil
 
 
@@ -19,8 +34,36 @@ def create_crud_routes(
     tags: Optional[list] = None,
     required_roles: Optional[Dict[str, List[str]]] = None,
     custom_routes: Optional[List[Callable[[APIRouter], None]]] = None,
+    count_strategy: str = "exact",
+    count_cache_ttl: float = 60,
+    bulk_max_items: int = 1000,
+    before_write: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    conditional_get: bool = True,
+    filterable: Optional[set] = None,
+    sortable: Optional[set] = None,
+    aggregatable: Optional[set] = None,
+    concurrency_limits: Optional[Dict[str, int]] = None,
+    single_flight: bool = False,
+    includable: Optional[set] = None,
+    group_commit: Union[bool, dict] = False,
 ) -> APIRouter:
     router = APIRouter(tags=tags or [model.__name__.capitalize()])
+    includable = set(includable or ())
+    single_flight = SingleFlight(model.__tablename__) if single_flight else None
+    aggregatable = set(DEFAULT_AGGREGATABLE) if aggregatable is None else aggregatable
+    serializer = ResponseSerializer(model, schema_response)
+    write_batcher = None
+    if group_commit:
+        # `True` for the default window and batch size, or a dict overriding them
+        options = group_commit if isinstance(group_commit, dict) else {}
+        write_batcher = WriteBatcher(
+            model, serializer.dump_item,
+            window=options.get("window_ms", settings.group_commit_window_ms) / 1000,
+            max_batch=options.get("max_batch", settings.group_commit_max_batch))
+
+    if count_strategy not in COUNT_STRATEGIES:
+        raise ValueError(
+            f"Invalid count_strategy '{count_strategy}' for {model.__name__}; use one of {COUNT_STRATEGIES}")
 
     def parse_filter_query(filters: Optional[str]) -> Optional[dict]:
         if filters:
@@ -32,19 +75,79 @@ def create_crud_routes(
         return None
 
     def select_fields(query, fields: Optional[str]):
-        if fields:
-            try:
-                selected_fields = [getattr(model, field.strip())
-                                   for field in fields.split(",") if hasattr(model, field.strip())]
-                if not selected_fields:
-                    raise HTTPException(
-                        status_code=400, detail="Invalid fields specified.")
-                # Use * to unpack the selected fields into positional arguments
-                query = query.with_only_columns(*selected_fields)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=str(e))
+        """
+        Narrow `query` to a `fields=` projection, outer joining the
+        relationships that dotted fields (`role.name`) go through.
+        """
+        if not fields:
+            return query
+        selected_fields, joins = projected_columns(model, fields, includable)
+        if not selected_fields:
+            raise HTTPException(
+                status_code=400, detail="Invalid fields specified.")
+        # Use * to unpack the selected fields into positional arguments
+        query = query.with_only_columns(*selected_fields)
+        for relation in joins:
+            query = query.outerjoin(getattr(model, relation))
         return query
 
+    def select_relations(query, include: Optional[str], fields: Optional[str]):
+        """
+        Eager loader options for `include=`, and whether the response carries
+        related data (which the row validators do not cover).
+        """
+        relations = parse_include(model, include, includable)
+        if relations and fields:
+            raise HTTPException(
+                status_code=400, detail="Use dotted fields (e.g. 'role.name') to project related columns.")
+        if relations:
+            query = query.options(*loader_options(model, relations))
+        return query, relations, bool(relations) or "." in (fields or "")
+
+    def parse_sort(sort: Optional[str]):
+        """
+        Resolve the `field:dir` sort syntax into (column, ascending).
+        Defaults to createdAt ascending.
+        """
+        if not sort:
+            return model.createdAt, True
+        try:
+            sort_field, sort_direction = sort.split(":")
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="Invalid sort format. Use 'field:asc' or 'field:desc'.")
+        if sort_direction.lower() not in ["asc", "desc"]:
+            raise HTTPException(
+                status_code=400, detail="Invalid sort direction. Use 'asc' or 'desc'."
+            )
+        column = getattr(model, sort_field, None)
+        if column is None:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid sort field: {sort_field}")
+        if sortable is not None and sort_field not in sortable:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Sorting on {sort_field} is not allowed; sortable fields: {', '.join(sorted(sortable))}")
+        return column, sort_direction.lower() == "asc"
+
+    def request_scope(request: Request, current_user) -> tuple:
+        """
+        The parts of a coalescing key that come from the caller: role, whether
+        reads are pinned to the master, and conditional request headers.
+        """
+        return (getattr(current_user, "role_name", None), is_pinned_to_master(request),
+                request.headers.get("if-none-match"), request.headers.get("if-modified-since"))
+
+    async def coalesced(request: Request, key: tuple, load):
+        """
+        Run `load` once for all identical concurrent requests. It gets its own
+        read session since it may outlive the request that started it.
+        """
+        async def run():
+            async with read_session_factory(request)() as session:
+                return await load(session)
+        return clone_response(await single_flight.do(key, run))
+
     # Add custom routes if provided
     if custom_routes:
         for custom_route in custom_routes:
@@ -52,143 +155,486 @@ def create_crud_routes(
 
     @router.get("")
     async def read_all(
+        request: Request,
         filters: Optional[str] = Query(None),
         sort: Optional[str] = Query(None),
         fields: Optional[str] = Query(
             None, description="Comma-separated list of fields to include in the response"),
         page: int = Query(1, ge=1, description="Page number"),
         size: int = Query(50, ge=1, le=100, description="Page size"),
+        pagination: str = Query(
+            "offset", pattern="^(offset|cursor)$", description="Pagination mode: 'offset' or 'cursor'"),
+        after: Optional[str] = Query(
+            None, description="Cursor mode: return rows after this cursor"),
+        before: Optional[str] = Query(
+            None, description="Cursor mode: return rows before this cursor"),
+        include: Optional[str] = Query(
+            None, description="Comma-separated relationships to load with each row"),
         session: AsyncSession = Depends(get_read_session),
         current_user=Depends(get_current_active_user_with_roles(
             required_roles.get("read_all", []))),
     ):
-        try:
-            parsed_filters = parse_filter_query(filters)
-            filter_expression = parse_filters(
-                model, parsed_filters) if parsed_filters else None
+        async def load(session):
+            try:
+                parsed_filters = parse_filter_query(filters)
+                filter_expression, filter_params = compile_filters(
+                    model, parsed_filters, filterable) if parsed_filters else (None, {})
 
-            # Start with base query
-            query = select(model)
+                # Start with base query
+                query = select(model)
 
-            if filter_expression is not None:
-                query = query.where(filter_expression)
+                if filter_expression is not None:
+                    query = query.where(filter_expression)
 
-            if sort:
-                try:
-                    sort_field, sort_direction = sort.split(":")
-                    if sort_direction.lower() not in ["asc", "desc"]:
-                        raise HTTPException(
-                            status_code=400, detail="Invalid sort direction. Use 'asc' or 'desc'."
-                        )
-                    column = getattr(model, sort_field, None)
-                    if column is None:
-                        raise ValueError(f"Invalid sort field: {sort_field}")
-                    query = query.order_by(
-                        asc(column) if sort_direction.lower(
-                        ) == "asc" else desc(column)
-                    )
-                except ValueError as e:
-                    raise HTTPException(status_code=400, detail=str(e))
-            else:
-                query = query.order_by(asc(model.createdAt))
+                sort_column, ascending = parse_sort(sort)
 
-            # Handle fields selection
-            if fields:
-                selected_fields = [getattr(model, field.strip()) for field in fields.split(
-                    ",") if hasattr(model, field.strip())]
-                if not selected_fields:
-                    raise HTTPException(
-                        status_code=400, detail="Invalid fields specified.")
-                query = query.with_only_columns(*selected_fields)
+                # Handle fields selection and relationship loading
+                query, relations, related = select_relations(query, include, fields)
+                query = select_fields(query, fields)
 
-            # Count total records for pagination
-            total_query = select(func.count()).select_from(query.subquery())
-            total_result = await session.execute(total_query)
-            total_records = total_result.scalar()
+                cursor_mode = pagination == "cursor" or after or before
+                # count + max(updatedAt) of the filtered set validates every page of
+                # it. Only computed when an exact offset page counts anyway or the
+                # client is revalidating: the other strategies exist to avoid counting.
+                headers = validated_total = None
+                if conditional_get and not related and (
+                        has_conditional_headers(request) or (count_strategy == "exact" and not cursor_mode)):
+                    validated_total, last_modified = await set_validator(session, model, query, filter_params)
+                    etag = make_etag(model.__tablename__, variant_key(request), validated_total, last_modified)
+                    headers = validator_headers(etag, last_modified)
+                    if is_not_modified(request, etag, last_modified):
+                        return not_modified(headers)
 
-            # Apply pagination
-            offset = (page - 1) * size
-            query = query.offset(offset).limit(size)
+                if cursor_mode:
+                    if after and before:
+                        raise HTTPException(
+                            status_code=400, detail="Use either 'after' or 'before', not both.")
+                    return await read_page_by_cursor(
+                        session, query, filter_params, sort_column, ascending, size, after, before, bool(fields),
+                        headers, relations)
 
-            # Execute the query
-            result = await session.execute(query)
-            rows = result.fetchall()
+                if not sort and SEARCH_PARAM in filter_params:
+                    # Best matches first when searching without an explicit sort
+                    query = query.order_by(desc(get_search_config(model).rank()), model.id)
+                else:
+                    query = query.order_by(
+                        asc(sort_column) if ascending else desc(sort_column))
 
-            # Convert rows to dictionaries using _mapping
-            response = [dict(row._mapping) for row in rows]
+                # Apply pagination
+                offset = (page - 1) * size
+                if count_strategy == "none":
+                    # Skip counting; fetch one extra row to know if a next page exists
+                    result = await session.execute(query.offset(offset).limit(size + 1), filter_params)
+                    rows = result.fetchall()
+                    has_next = len(rows) > size
+                    rows = rows[:size]
+                    total_records = total_pages = None
+                    count_strategy_used = "none"
+                elif validated_total is not None and count_strategy == "exact":
+                    # The validator query already counted the filtered set
+                    total_records, count_strategy_used = validated_total, "exact"
+                    result = await session.execute(query.offset(offset).limit(size), filter_params)
+                    rows = result.fetchall()
+                    total_pages = ceil(total_records / size)
+                    has_next = page < total_pages
+                else:
+                    # Count total records for pagination
+                    total_records, count_strategy_used = await count_records(
+                        session, model, query, count_strategy, filter_params,
+                        normalize_filters(parsed_filters), count_cache_ttl)
 
-            # Remove the outer key
-            if response and isinstance(response[0], dict) and len(response[0]) == 1:
-                response = [list(item.values())[0] for item in response]
+                    # Execute the query
+                    result = await session.execute(query.offset(offset).limit(size), filter_params)
+                    rows = result.fetchall()
+                    total_pages = ceil(total_records / size)
+                    has_next = page < total_pages
 
-            # Create paginated response
-            total_pages = ceil(total_records / size)
-            return {
-                "data": response,
-                "meta": {
+                # Hand the connection back before serializing; rows are plain tuples
+                await session.close()
+
+                # Convert rows to dictionaries using _mapping
+                response = [dict(row._mapping) for row in rows]
+
+                # Create paginated response
+                return RawJSONResponse(json_envelope(serializer.dump_rows(response, bool(fields), relations), {
                     "total_records": total_records,
+                    "total_records_strategy": count_strategy_used,
                     "total_pages": total_pages,
                     "current_page": page,
                     "page_size": size,
+                    "has_next": has_next,
+                }), headers=headers)
+            except SQLAlchemyError as e:
+                error_message = str(e).split("\n")[1]
+                raise HTTPException(status_code=400, detail=error_message)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if single_flight is None:
+            return await load(session)
+        key = ("read_all", normalize_filters(parse_filter_query(filters)), sort, fields, page, size,
+               pagination, after, before, include, *request_scope(request, current_user))
+        return await coalesced(request, key, load)
+
+    async def read_page_by_cursor(session, query, params, sort_column, ascending, size, after, before, projected,
+                                  headers=None, relations=()):
+        """
+        Keyset pagination: seek past the cursor with `(sort_col, id) > (...)`
+        instead of OFFSET, so every page costs the same regardless of depth.
+        """
+        cursor = after or before
+        # Walk backwards from a `before` cursor, then restore the order
+        forward = before is None
+        scan_ascending = ascending if forward else not ascending
+
+        if cursor:
+            sort_value, row_id = decode_cursor(cursor, sort_column)
+            query = query.where(keyset_condition(
+                sort_column, model.id, sort_value, row_id, scan_ascending))
+
+        order = asc if scan_ascending else desc
+        query = query.add_columns(
+            sort_column.label("_cursor_key"), model.id.label("_cursor_id")
+        ).order_by(order(sort_column), order(model.id)).limit(size + 1)
+
+        result = await session.execute(query, params)
+        rows = result.fetchall()
+        await session.close()
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if not forward:
+            rows.reverse()
+
+        response = []
+        keys = []
+        for row in rows:
+            item = dict(row._mapping)
+            keys.append((item.pop("_cursor_key"), item.pop("_cursor_id")))
+            response.append(item)
+
+        has_next = has_more if forward else True
+        has_previous = bool(after) if forward else has_more
+        return RawJSONResponse(json_envelope(serializer.dump_rows(response, projected, relations), {
+            "page_size": size,
+            "has_next": has_next and bool(keys),
+            "has_previous": has_previous and bool(keys),
+            "next_cursor": encode_cursor(*keys[-1]) if has_next and keys else None,
+            "previous_cursor": encode_cursor(*keys[0]) if has_previous and keys else None,
+        }), headers=headers)
+
+    def check_bulk_size(items: list):
+        if not items:
+            raise HTTPException(status_code=400, detail="No items provided.")
+        if len(items) > bulk_max_items:
+            raise HTTPException(
+                status_code=400, detail=f"Too many items. The maximum batch size is {bulk_max_items}.")
+
+    def bulk_error_response(errors: list):
+        # Same shape as the request validation handler, with the item index
+        return JSONResponse(status_code=422, content={"message": errors, "status": False})
+
+    @router.post("/bulk")
+    async def bulk_create(items: List[Any] = Body(...), session: AsyncSession = Depends(get_write_session),
+                          current_user=Depends(get_current_active_user_with_roles(
+                              required_roles.get("create", [])))):
+        check_bulk_size(items)
+        validated, errors = validate_items(schema_create, items)
+        if errors:
+            return bulk_error_response(errors)
+        try:
+            rows = [item.model_dump() for item in validated]
+            if before_write:
+                await before_write(rows)
+            objs = await bulk_insert(session, model, rows)
+            data = serializer.dump_items(objs)
+            await session.commit()
+            return RawJSONResponse(json_envelope(data, {"count": len(objs)}))
+        except SQLAlchemyError as e:
+            await session.rollback()
+            error_message = str(e).split("\n")[1]
+            raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @router.patch("/bulk")
+    async def bulk_update_items(items: List[Any] = Body(...), session: AsyncSession = Depends(get_write_session),
+                                current_user=Depends(get_current_active_user_with_roles(
+                                    required_roles.get("update", [])))):
+        check_bulk_size(items)
+        validated, errors = validate_items(schema_update, items, exclude=("documentId",))
+        changes = {}
+        if not errors:
+            for index, (item, data) in enumerate(zip(items, validated)):
+                document_id = item.get("documentId")
+                update_data = data.model_dump(exclude_unset=True)
+                if not isinstance(document_id, str):
+                    errors.append({"index": index, "field": "documentId", "message": "Field required"})
+                elif document_id in changes:
+                    errors.append({"index": index, "field": "documentId", "message": "Duplicate documentId"})
+                elif not update_data:
+                    errors.append({"index": index, "field": "", "message": "No fields to update"})
+                else:
+                    changes[document_id] = update_data
+        if errors:
+            return bulk_error_response(errors)
+        try:
+            if before_write:
+                await before_write(list(changes.values()))
+            objs = await bulk_update(session, model, changes)
+            data = serializer.dump_items(objs)
+            updated = {obj.documentId for obj in objs}
+            await session.commit()
+            invalidate_principal_cache(model)
+            return RawJSONResponse(json_envelope(data, {
+                "count": len(objs),
+                "missing": [document_id for document_id in changes if document_id not in updated],
+            }))
+        except SQLAlchemyError as e:
+            await session.rollback()
+            error_message = str(e).split("\n")[1]
+            raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @router.delete("/bulk")
+    async def bulk_delete_items(documentIds: List[str] = Body(..., embed=True),
+                                session: AsyncSession = Depends(get_write_session),
+                                current_user=Depends(get_current_active_user_with_roles(
+                                    required_roles.get("delete", [])))):
+        check_bulk_size(documentIds)
+        document_ids = list(dict.fromkeys(documentIds))
+        try:
+            deleted = await bulk_delete(session, model, document_ids)
+            await session.commit()
+            invalidate_principal_cache(model)
+            deleted_ids = set(deleted)
+            return {
+                "data": {
+                    "deleted": [document_id for document_id in document_ids if document_id in deleted_ids],
+                    "missing": [document_id for document_id in document_ids if document_id not in deleted_ids],
                 },
+                "meta": {"count": len(deleted_ids)},
             }
         except SQLAlchemyError as e:
+            await session.rollback()
             error_message = str(e).split("\n")[1]
             raise HTTPException(status_code=400, detail=error_message)
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
-    @router.get("/{documentId}")
-    async def read_one(
-        documentId: str,
+    @router.post("/batch-get")
+    @read_only
+    async def batch_get(
+        documentIds: List[str] = Body(..., embed=True),
         fields: Optional[str] = Query(
             None, description="Comma-separated list of fields to include in the response"),
+        include: Optional[str] = Query(
+            None, description="Comma-separated relationships to load with each row"),
         session: AsyncSession = Depends(get_read_session),
         current_user=Depends(get_current_active_user_with_roles(
-            required_roles.get("read_one", [])))
+            required_roles.get("read_one", []))),
+    ):
+        """Many rows by documentId in one query, in request order; unknown ids are listed as missing."""
+        check_bulk_size(documentIds)
+        document_ids = list(dict.fromkeys(documentIds))
+        try:
+            query, relations, _ = select_relations(select(model), include, fields)
+            query = select_fields(query, fields)
+            rows = await fetch_by_document_ids(session, model, query, document_ids)
+            await session.close()
+            return RawJSONResponse(json_envelope(
+                serializer.dump_rows([rows[document_id] for document_id in document_ids if document_id in rows],
+                                     bool(fields), relations), {
+                    "count": len(rows),
+                    "missing": [document_id for document_id in document_ids if document_id not in rows],
+                }))
+        except SQLAlchemyError as e:
+            error_message = str(e).split("\n")[1]
+            raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @router.get("/export")
+    async def export(
+        request: Request,
+        format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Export format: 'ndjson' or 'csv'"),
+        filters: Optional[str] = Query(None),
+        sort: Optional[str] = Query(None),
+        fields: Optional[str] = Query(
+            None, description="Comma-separated list of fields to include in the export"),
+        current_user=Depends(get_current_active_user_with_roles(
+            required_roles.get("read_all", []))),
     ):
         try:
-            # Base query
-            query = select(model).where(model.documentId == documentId)
+            parsed_filters = parse_filter_query(filters)
+            filter_expression, filter_params = compile_filters(
+                model, parsed_filters, filterable) if parsed_filters else (None, {})
 
-            # Handle fields selection
+            # Plain columns rather than ORM entities: rows are streamed, never tracked
             if fields:
-                selected_fields = [getattr(model, field.strip()) for field in fields.split(
+                columns = [getattr(model, field.strip()) for field in fields.split(
                     ",") if hasattr(model, field.strip())]
-                if not selected_fields:
+                if not columns:
                     raise HTTPException(
                         status_code=400, detail="Invalid fields specified.")
-                query = query.with_only_columns(*selected_fields)
+            else:
+                columns = list(model.__table__.columns)
+            query = select(*columns)
+
+            if filter_expression is not None:
+                query = query.where(filter_expression)
+
+            sort_column, ascending = parse_sort(sort)
+            order = asc if ascending else desc
+            query = query.order_by(order(sort_column), order(model.id))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-            # Execute the query
-            result = await session.execute(query)
-            db_data = result.fetchone()  # Fetch a single row
+        media_type, extension = EXPORT_FORMATS[format]
+        return StreamingResponse(
+            stream_export(query, filter_params, format, settings.export_fetch_size,
+                          read_session_factory(request)),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{model.__tablename__}.{extension}"'},
+        )
 
-            # Check if data exists
-            if not db_data:
-                raise HTTPException(status_code=404, detail="Data not found")
+    @router.get("/aggregate")
+    async def aggregate(
+        filters: Optional[str] = Query(None),
+        group_by: Optional[str] = Query(
+            None, description="Comma-separated group keys: 'field' or 'field:day|week|month'"),
+        metrics: Optional[str] = Query(
+            None, description="Comma-separated aggregates: 'count' or 'count|sum|avg|min|max:field'"),
+        limit: int = Query(1000, ge=1, le=10000, description="Maximum number of groups"),
+        session: AsyncSession = Depends(get_read_session),
+        current_user=Depends(get_current_active_user_with_roles(
+            required_roles.get("read_all", []))),
+    ):
+        try:
+            parsed_filters = parse_filter_query(filters)
+            filter_expression, filter_params = compile_filters(
+                model, parsed_filters, filterable) if parsed_filters else (None, {})
+            keys = parse_group_by(model, group_by, aggregatable)
+            aggregates = parse_metrics(model, metrics, aggregatable)
 
-            # Convert to dictionary
-            return dict(db_data._mapping)
+            result = await session.execute(
+                build_aggregate_query(model, keys, aggregates, filter_expression, limit), filter_params)
+            rows = result.fetchall()
+            await session.close()
+            truncated = len(rows) > limit
+            rows = rows[:limit]
+            return {
+                "data": compact_rows(keys, aggregates, rows),
+                "meta": {"groups": len(rows), "truncated": truncated},
+            }
         except SQLAlchemyError as e:
             error_message = str(e).split("\n")[1]
             raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
+    @router.get("/{documentId}")
+    async def read_one(
+        request: Request,
+        documentId: str,
+        fields: Optional[str] = Query(
+            None, description="Comma-separated list of fields to include in the response"),
+        include: Optional[str] = Query(
+            None, description="Comma-separated relationships to load with the row"),
+        session: AsyncSession = Depends(get_read_session),
+        current_user=Depends(get_current_active_user_with_roles(
+            required_roles.get("read_one", [])))
+    ):
+        async def load(session):
+            try:
+                # Base query, with fields selection and relationship loading
+                query = select(model).where(model.documentId == documentId)
+                query, relations, related = select_relations(query, include, fields)
+                query = select_fields(query, fields)
+                conditional = conditional_get and not related
+
+                if conditional and has_conditional_headers(request):
+                    # Cheap validator first: answer 304 without loading the row
+                    validator = await row_validator(session, model, documentId)
+                    if validator is None:
+                        raise HTTPException(status_code=404, detail="Data not found")
+                    etag = make_etag(model.__tablename__, documentId, variant_key(request), validator.updatedAt)
+                    if is_not_modified(request, etag, validator.updatedAt):
+                        return not_modified(validator_headers(etag, validator.updatedAt))
+
+                # Execute the query
+                result = await session.execute(query.add_columns(model.updatedAt.label("_etag_updated_at")))
+                db_data = result.fetchone()  # Fetch a single row
+                # Release the connection; the loaded row stays readable detached
+                await session.close()
+
+                # Check if data exists
+                if not db_data:
+                    raise HTTPException(status_code=404, detail="Data not found")
+
+                item = dict(db_data._mapping)
+                updated_at = item.pop("_etag_updated_at")
+                headers = None
+                if conditional:
+                    headers = validator_headers(
+                        make_etag(model.__tablename__, documentId, variant_key(request), updated_at), updated_at)
+
+                # Full rows keep their `{ModelName: {...}}` wrapper, as before
+                if not fields:
+                    return RawJSONResponse(
+                        b'{"' + model.__name__.encode() + b'":' + serializer.dump_item(db_data[0], relations) + b"}",
+                        headers=headers)
+                return RawJSONResponse(serializer.dump_projection(item), headers=headers)
+            except SQLAlchemyError as e:
+                error_message = str(e).split("\n")[1]
+                raise HTTPException(status_code=400, detail=error_message)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if single_flight is None:
+            return await load(session)
+        key = ("read_one", documentId, fields, include, *request_scope(request, current_user))
+        return await coalesced(request, key, load)
+
     @router.post("")
     async def create(item: schema_create, session: AsyncSession = Depends(get_write_session),
                      current_user=Depends(get_current_active_user_with_roles(
                          required_roles.get("create", [])))):
         try:
-            obj = model(**item.dict())
+            data = item.model_dump()
+            if before_write:
+                await before_write([data])
+            if write_batcher is not None:
+                # Shares an INSERT and a commit with concurrent creates
+                return RawJSONResponse(await write_batcher.submit(data))
+            obj = model(**data)
             session.add(obj)
-            await session.commit()
+            # Flush and read back server defaults inside the transaction, so the
+            # connection is released by the commit rather than held for a refresh
+            await session.flush()
             await session.refresh(obj)
-            return obj
+            response = serializer.dump_item(obj)
+            await session.commit()
+            return RawJSONResponse(response)
         except SQLAlchemyError as e:
             error_message = str(e).split("\n")
             raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
@@ -197,20 +643,23 @@ def create_crud_routes(
                      current_user=Depends(get_current_active_user_with_roles(
                          required_roles.get("update", [])))):
         try:
-            db_data = await session.execute(select(model).where(model.documentId == documentId))
-            db_data = db_data.scalar_one_or_none()
-            if not db_data:
-                raise Exception("Data not found")
             update_data = item.model_dump(exclude_unset=True)
-            for key, value in update_data.items():
-                if hasattr(db_data, key):
-                    setattr(db_data, key, value)
+            if before_write and update_data:
+                await before_write([update_data])
+            db_data = await update_one(session, model, documentId, update_data)
+            if db_data is None:
+                raise HTTPException(status_code=404, detail="Data not found")
+            # Serialize before commit expires the returned object
+            response = serializer.dump_item(db_data)
             await session.commit()
-            await session.refresh(db_data)
-            return db_data
+            invalidate_principal_cache(model, documentId)
+            return RawJSONResponse(response)
         except SQLAlchemyError as e:
+            await session.rollback()
             error_message = str(e).split("\n")[1]
             raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
         except ValueError:
             raise HTTPException(
                 status_code=400, detail="ID must be a valid integer.")
@@ -221,20 +670,24 @@ def create_crud_routes(
     async def delete(documentId: str, session: AsyncSession = Depends(get_write_session), current_user=Depends(get_current_active_user_with_roles(
             required_roles.get("delete", [])))):
         try:
-            db_data = await session.execute(select(model).where(model.documentId == documentId))
-            db_data = db_data.scalar_one_or_none()
-            if not db_data:
-                raise Exception("Data not found")
-            await session.delete(db_data)
+            if not await delete_one(session, model, documentId):
+                raise HTTPException(status_code=404, detail="Data not found")
             await session.commit()
+            invalidate_principal_cache(model, documentId)
             return True
         except SQLAlchemyError as e:
+            await session.rollback()
             error_message = str(e).split("\n")[1]
             raise HTTPException(status_code=400, detail=error_message)
+        except HTTPException:
+            raise
         except ValueError:
             raise HTTPException(
                 status_code=400, detail="ID must be a valid integer.")
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
+    if concurrency_limits:
+        register_route_limits(router, concurrency_limits)
+
     return router
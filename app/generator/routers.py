@@ -1,5 +1,5 @@
 from app.generator.base import create_crud_routes
-from typing import List, Callable, Dict, Type, Tuple
+from typing import List, Callable, Dict, Type, Tuple, Awaitable, Union
 from app.models.user import UserRole
 from fastapi import APIRouter
 from pydantic import BaseModel
@@ -9,7 +9,19 @@ def generate_crud_router(
     model: Type,
     schemas: Tuple[Type[BaseModel], Type[BaseModel], Type[BaseModel]],
     required_roles: Dict[str, List[UserRole]] = None,
-    custom_routes: List[Callable[[APIRouter], None]] = None
+    custom_routes: List[Callable[[APIRouter], None]] = None,
+    count_strategy: str = "exact",
+    count_cache_ttl: float = 60,
+    bulk_max_items: int = 1000,
+    before_write: Callable[[List[dict]], Awaitable[None]] = None,
+    conditional_get: bool = True,
+    filterable: set = None,
+    sortable: set = None,
+    aggregatable: set = None,
+    concurrency_limits: Dict[str, int] = None,
+    single_flight: bool = False,
+    includable: set = None,
+    group_commit: Union[bool, dict] = False,
 ) -> APIRouter:
     schema_create, schema_update, schema_response = schemas
     return create_crud_routes(
@@ -19,5 +31,17 @@ def generate_crud_router(
         schema_response=schema_response,
         tags=[model.__name__.capitalize()],
         required_roles=required_roles,
-        custom_routes=custom_routes
+        custom_routes=custom_routes,
+        count_strategy=count_strategy,
+        count_cache_ttl=count_cache_ttl,
+        bulk_max_items=bulk_max_items,
+        before_write=before_write,
+        conditional_get=conditional_get,
+        filterable=filterable,
+        sortable=sortable,
+        aggregatable=aggregatable,
+        concurrency_limits=concurrency_limits,
+        single_flight=single_flight,
+        includable=includable,
+        group_commit=group_commit,
     )
@@ -1,12 +1,72 @@
-from pydantic import BaseModel, create_model
+from pydantic import BaseModel, PlainSerializer, create_model
 from sqlalchemy import inspect
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Annotated, List, Optional
 
 # Define IST timezone
 IST = timezone(timedelta(hours=5, minutes=30))
 
 
+def to_ist_isoformat(value: datetime) -> str:
+    return value.astimezone(IST).isoformat()
+
+
+# datetime rendered in IST when dumped to JSON, for values outside a response model
+ISTDatetime = Annotated[datetime, PlainSerializer(to_ist_isoformat, when_used="json")]
+
+
+class ProjectionBase(BaseModel):
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: to_ist_isoformat,
+        }
+
+
+@lru_cache(maxsize=256)
+def generate_projection_schema(model, field_names: tuple):
+    """
+    Response schema for a `fields=` projection: only the selected columns,
+    all optional, with dotted `relationship.column` names nested under
+    their relationship. Cached per model and field tuple.
+    """
+    mapper = inspect(model)
+    fields, related = {}, {}
+    for name in field_names:
+        relation, _, column = name.partition(".")
+        if column:
+            related.setdefault(relation, []).append(column)
+        else:
+            fields[name] = (Optional[mapper.columns[name].type.python_type], None)
+    for relation, columns in related.items():
+        target = mapper.relationships[relation].mapper.class_
+        fields[relation] = (Optional[generate_projection_schema(target, tuple(columns))], None)
+    return create_model(f"{model.__name__}Projection", __base__=ProjectionBase, **fields)
+
+
+def projected_column(model, name: str):
+    """The mapped column behind a projected field name, dotted or not."""
+    mapper = inspect(model)
+    relation, _, column = name.partition(".")
+    if column:
+        return mapper.relationships[relation].mapper.columns[column]
+    return mapper.columns[name]
+
+
+@lru_cache(maxsize=64)
+def generate_include_schema(model, schema_response, relations: tuple):
+    """`schema_response` plus the `include=` relationships, with all their columns."""
+    mapper = inspect(model)
+    fields = {}
+    for relation in relations:
+        relationship = mapper.relationships[relation]
+        target = relationship.mapper
+        schema = generate_projection_schema(target.class_, tuple(column.key for column in target.columns))
+        fields[relation] = (List[schema], []) if relationship.uselist else (Optional[schema], None)
+    return create_model(f"{model.__name__}Included", __base__=schema_response, **fields)
+
+
 def generate_schemas(model):
     # Inspect SQLAlchemy model columns
     mapper = inspect(model)
@@ -49,7 +109,7 @@ def generate_schemas(model):
         class Config:
             from_attributes = True
             json_encoders = {
-                datetime: lambda v: v.astimezone(IST).isoformat(),
+                datetime: to_ist_isoformat,
             }
 
     SchemaResponse = create_model(
@@ -0,0 +1,110 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from fastapi import Response
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from app.generator.schema import generate_projection_schema, generate_include_schema, projected_column, ISTDatetime
+
+
+class RawJSONResponse(Response):
+    """
+    Response for a body that is already serialized JSON bytes; skips
+    FastAPI's jsonable_encoder pass entirely.
+    """
+    media_type = "application/json"
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def nest_related(item: dict) -> dict:
+    """
+    Group dotted `relationship.column` keys of a projected row under their
+    relationship; a relationship whose columns are all NULL (no related row
+    for the outer join) becomes None.
+    """
+    nested, related = {}, {}
+    for key, value in item.items():
+        relation, _, column = key.partition(".")
+        if column:
+            related.setdefault(relation, {})[column] = value
+        else:
+            nested[key] = value
+    for relation, values in related.items():
+        nested[relation] = values if any(value is not None for value in values.values()) else None
+    return nested
+
+
+def json_envelope(data: bytes, meta: dict) -> bytes:
+    """Wrap serialized rows in the `{"data": ..., "meta": ...}` page envelope."""
+    return b'{"data":' + data + b',"meta":' + to_json(meta) + b"}"
+
+
+class ResponseSerializer:
+    """
+    Precompiled pydantic-core serializers for one generated model: the
+    SchemaResponse for full rows, extended with `include=` relationships,
+    and cached projection schemas for `fields=`.
+    """
+
+    def __init__(self, model, schema_response):
+        self.model = model
+        self.schema_response = schema_response
+        self.item_adapter = TypeAdapter(schema_response)
+        self.list_adapter = TypeAdapter(List[schema_response])
+
+    @lru_cache(maxsize=64)
+    def include_adapters(self, relations: Tuple[str, ...]):
+        """(item adapter, list adapter) for full rows with `include=` relationships."""
+        if not relations:
+            return self.item_adapter, self.list_adapter
+        schema = generate_include_schema(self.model, self.schema_response, relations)
+        return TypeAdapter(schema), TypeAdapter(List[schema])
+
+    def dump_item(self, obj, include: Tuple[str, ...] = ()) -> bytes:
+        adapter, _ = self.include_adapters(include)
+        return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+    def dump_items(self, objs: list, include: Tuple[str, ...] = ()) -> bytes:
+        _, adapter = self.include_adapters(include)
+        return adapter.dump_json(adapter.validate_python(objs, from_attributes=True))
+
+    @lru_cache(maxsize=256)
+    def projection_adapters(self, field_names: tuple):
+        """(item adapter, list adapter) for a `fields=` projection."""
+        schema = generate_projection_schema(self.model, field_names)
+        return TypeAdapter(schema), TypeAdapter(List[schema])
+
+    @lru_cache(maxsize=256)
+    def scalar_adapter(self, field_name: str) -> TypeAdapter:
+        python_type = projected_column(self.model, field_name).type.python_type
+        if python_type is datetime:
+            python_type = ISTDatetime
+        return TypeAdapter(List[Optional[python_type]])
+
+    def dump_rows(self, items: List[dict], projected: bool, include: Tuple[str, ...] = ()) -> bytes:
+        """
+        Serialize result mappings from a page query. Full-entity rows are
+        unwrapped from their `{ModelName: obj}` mapping; a single-field
+        projection is flattened to a list of values, as before.
+        """
+        if not projected:
+            return self.dump_items([next(iter(item.values())) for item in items], include)
+        if not items:
+            return b"[]"
+        field_names = tuple(items[0])
+        if len(field_names) == 1:
+            adapter = self.scalar_adapter(field_names[0])
+            return adapter.dump_json(adapter.validate_python(
+                [item[field_names[0]] for item in items]))
+        _, adapter = self.projection_adapters(field_names)
+        if any("." in name for name in field_names):
+            items = [nest_related(item) for item in items]
+        return adapter.dump_json(adapter.validate_python(items))
+
+    def dump_projection(self, item: dict) -> bytes:
+        adapter, _ = self.projection_adapters(tuple(item))
+        if any("." in name for name in item):
+            item = nest_related(item)
+        return adapter.dump_json(adapter.validate_python(item))
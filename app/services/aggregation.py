@@ -0,0 +1,132 @@
+"""
+Group-by aggregation for the generated `/aggregate` routes. Group keys,
+date buckets and aggregate functions are resolved against a per-model
+column whitelist and pushed down to a single GROUP BY query.
+
+    group_by=role_id,createdAt:month&metrics=count,max:updatedAt
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import select, func, literal_column, DateTime, Integer, Float, Numeric
+from app.core.config import settings
+from app.generator.schema import to_ist_isoformat
+
+AGGREGATE_FUNCTIONS = {
+    "count": func.count,
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+
+NUMERIC_FUNCTIONS = {"sum", "avg"}
+
+DATE_BUCKETS = ("day", "week", "month")
+
+# Aggregatable unless a model lists its columns under "aggregatable"
+DEFAULT_AGGREGATABLE = ("createdAt", "updatedAt")
+
+
+def aggregatable_fields(config: dict) -> set:
+    """Whitelisted columns: explicit, else the declared filterable/sortable ones."""
+    if "aggregatable" in config:
+        return set(config["aggregatable"])
+    return {*config.get("filterable", []), *config.get("sortable", []), *DEFAULT_AGGREGATABLE}
+
+
+def _column(model, name: str, allowed: set):
+    if name not in allowed:
+        raise ValueError(
+            f"Cannot aggregate on '{name}'; allowed fields: {', '.join(sorted(allowed))}")
+    column = model.__table__.c.get(name)
+    if column is None:
+        raise ValueError(f"Unknown field '{name}'")
+    return column
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def date_bucket(column, unit: str):
+    """
+    `date_trunc` in the configured timezone; timestamps are stored as naive
+    UTC, so buckets line up with the local day rather than the UTC one.
+    Constants are inlined so the GROUP BY matches the select list exactly.
+    """
+    local = func.timezone(literal_column(f"'{settings.aggregate_timezone}'"),
+                          func.timezone(literal_column("'UTC'"), column))
+    return func.date_trunc(literal_column(f"'{unit}'"), local)
+
+
+def parse_group_by(model, group_by: Optional[str], allowed: set) -> List[Tuple[str, object, bool]]:
+    """`field` or `field:day|week|month` items into (label, expression, is_bucket)."""
+    keys = []
+    for item in _split(group_by):
+        name, _, unit = item.partition(":")
+        column = _column(model, name, allowed)
+        if unit:
+            if unit not in DATE_BUCKETS:
+                raise ValueError(f"Invalid date bucket '{unit}'; use one of {DATE_BUCKETS}")
+            if not isinstance(column.type, DateTime):
+                raise ValueError(f"Date buckets need a datetime field, '{name}' is not")
+            keys.append((f"{name}_{unit}", date_bucket(column, unit), True))
+        else:
+            keys.append((name, column, False))
+    return keys
+
+
+def parse_metrics(model, metrics: Optional[str], allowed: set) -> List[Tuple[str, object]]:
+    """`count` or `function:field` items into (label, expression)."""
+    expressions = []
+    for item in _split(metrics) or ["count"]:
+        function, _, name = item.partition(":")
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(
+                f"Invalid aggregate '{function}'; use one of {', '.join(AGGREGATE_FUNCTIONS)}")
+        if not name:
+            if function != "count":
+                raise ValueError(f"Aggregate '{function}' needs a field, e.g. '{function}:field'")
+            expressions.append(("count", func.count()))
+            continue
+        column = _column(model, name, allowed)
+        if function in NUMERIC_FUNCTIONS and not isinstance(column.type, (Integer, Float, Numeric)):
+            raise ValueError(f"Aggregate '{function}' needs a numeric field, '{name}' is not")
+        expressions.append((f"{function}_{name}", AGGREGATE_FUNCTIONS[function](column)))
+    return expressions
+
+
+def build_aggregate_query(model, keys, metrics, filter_expression=None, limit: int = 1000):
+    """
+    One GROUP BY statement ordered by the group keys; selects `limit + 1`
+    groups so the caller can tell when the result was truncated.
+    """
+    query = select(*[expression.label(label) for label, expression, _ in keys],
+                   *[expression.label(label) for label, expression in metrics]).select_from(model)
+    if filter_expression is not None:
+        query = query.where(filter_expression)
+    if keys:
+        expressions = [expression for _, expression, _ in keys]
+        query = query.group_by(*expressions).order_by(*expressions).limit(limit + 1)
+    return query
+
+
+def _json_value(value, bucketed: bool):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        # Buckets are already local; other timestamps follow the API's IST output
+        return value.date().isoformat() if bucketed else to_ist_isoformat(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def compact_rows(keys, metrics, rows: Iterable) -> dict:
+    """`{"columns": [...], "rows": [[...], ...]}` with JSON-ready values."""
+    flags = [*[is_bucket for _, _, is_bucket in keys], *[False] * len(metrics)]
+    return {
+        "columns": [*[label for label, _, _ in keys], *[label for label, _ in metrics]],
+        "rows": [[_json_value(value, flag) for value, flag in zip(row, flags)] for row in rows],
+    }
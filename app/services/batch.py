@@ -0,0 +1,133 @@
+"""
+In-process execution of the sub-requests of `POST /api/_batch`. Each one
+goes through the full ASGI app (middleware, routing, exception handlers)
+without a network round trip, with the batch request's headers and the
+principal the batch already authenticated.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlencode
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+BATCH_PATH = "/api/_batch"
+
+# request.state key holding (token, principal) for get_current_user
+BATCH_PRINCIPAL = "batch_principal"
+
+# Headers that describe the batch request's own body
+BODY_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"expect"}
+
+
+class SubRequest(BaseModel):
+    method: str = "GET"
+    path: str
+    # A query string, or parameters; objects (e.g. `filters`) are sent as JSON
+    query: Union[str, Dict[str, Any]] = {}
+
+
+def query_string(raw: str, query: Union[str, Dict[str, Any]]) -> bytes:
+    if isinstance(query, str):
+        encoded = query.lstrip("?")
+    else:
+        params = {}
+        for name, value in query.items():
+            if isinstance(value, dict):
+                value = json.dumps(value)
+            elif isinstance(value, bool):
+                value = "true" if value else "false"
+            params[name] = value
+        encoded = urlencode(params, doseq=True)
+    return "&".join(part for part in (raw, encoded) if part).encode()
+
+
+def rejection(method: str, path: str) -> Optional[tuple]:
+    """(status, detail) for sub-requests the batch does not run."""
+    if method != "GET":
+        return 405, "Only GET sub-requests can be batched"
+    if not path.startswith("/api/") or path == BATCH_PATH:
+        return 400, "Sub-request paths must be API routes other than the batch endpoint"
+    return None
+
+
+def item_json(status: int, content_type: bytes, body: bytes, elapsed: float) -> bytes:
+    """One result: JSON bodies are embedded as they are, anything else as a string."""
+    if not body:
+        payload = b"null"
+    elif content_type.startswith(b"application/json"):
+        payload = body
+    else:
+        payload = to_json(body.decode("utf-8", "replace"))
+    return (b'{"status":' + str(status).encode() + b',"time_ms":' + f"{elapsed * 1000:.2f}".encode()
+            + b',"body":' + payload + b"}")
+
+
+async def run_subrequest(app, parent_scope: dict, item: SubRequest, state: dict) -> bytes:
+    started = time.perf_counter()
+    method = item.method.upper()
+    path, _, raw_query = item.path.partition("?")
+    rejected = rejection(method, path)
+    if rejected is not None:
+        status, detail = rejected
+        return item_json(status, b"application/json", to_json({"message": detail, "status": False}),
+                         time.perf_counter() - started)
+
+    scope = {
+        "type": "http",
+        "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent_scope.get("http_version", "1.1"),
+        "method": method,
+        "scheme": parent_scope.get("scheme", "http"),
+        "server": parent_scope.get("server"),
+        "client": parent_scope.get("client"),
+        "root_path": parent_scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string(raw_query, item.query),
+        "headers": [(name, value) for name, value in parent_scope["headers"] if name not in BODY_HEADERS],
+        "state": dict(state),
+    }
+    finished = asyncio.Event()
+    request_sent = False
+    status, content_type, body = 500, b"", []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Disconnect listeners (streaming responses) wait here until the response is done
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, content_type
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for name, value in message.get("headers", []):
+                if name.lower() == b"content-type":
+                    content_type = value
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # The server error middleware has already sent its 500, if it could
+        status = 500
+    finally:
+        finished.set()
+    return item_json(status, content_type, b"".join(body), time.perf_counter() - started)
+
+
+async def run_batch(app, parent_scope: dict, items: List[SubRequest], state: dict, concurrency: int) -> List[bytes]:
+    """Results in request order; at most `concurrency` sub-requests run at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            return await run_subrequest(app, parent_scope, item, state)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
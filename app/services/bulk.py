@@ -0,0 +1,202 @@
+from typing import Dict, List, Tuple
+from sqlalchemy import inspect, insert, update, delete, select, values, column, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from pydantic import ValidationError
+
+
+def has_orm_listeners(model, event_name: str) -> bool:
+    """
+    True when mapper events such as the User password hashing
+    `before_insert` listener are registered for `model`. Core statements
+    bypass those events, so writes to such models go through the ORM.
+    """
+    return bool(getattr(inspect(model).dispatch, event_name))
+
+
+def has_custom_init(model) -> bool:
+    """
+    True when `model` defines its own `__init__`, e.g. Role lowercasing its
+    name. Core inserts never construct objects, so they would skip it.
+    """
+    mapper = inspect(model)
+    return mapper.class_manager.original_init is not mapper.registry.constructor
+
+
+def needs_orm_insert(model) -> bool:
+    return has_orm_listeners(model, "before_insert") or has_custom_init(model)
+
+
+def needs_orm_update(model) -> bool:
+    return has_orm_listeners(model, "before_update") or has_orm_listeners(model, "after_update")
+
+
+def needs_orm_delete(model) -> bool:
+    return has_orm_listeners(model, "before_delete") or has_orm_listeners(model, "after_delete")
+
+
+def validate_items(schema, items: List[dict], exclude: Tuple[str, ...] = ()):
+    """
+    Validate each item against `schema`, collecting errors per item instead
+    of failing on the first bad one.
+    Returns (validated, errors) where errors carry the item index.
+    """
+    validated, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "field": "", "message": "Item must be an object"})
+            continue
+        try:
+            validated.append(schema.model_validate(
+                {key: value for key, value in item.items() if key not in exclude}))
+        except ValidationError as e:
+            for error in e.errors():
+                errors.append({
+                    "index": index,
+                    "field": ".".join(map(str, error["loc"])),
+                    "message": error["msg"],
+                })
+    return validated, errors
+
+
+async def bulk_insert(session, model, rows: List[dict]) -> list:
+    """
+    Insert all rows with a multi-row INSERT ... RETURNING.
+    Models with insert listeners or their own `__init__` are flushed through
+    the unit of work, which still batches the rows into a single
+    INSERT ... RETURNING statement.
+    """
+    if needs_orm_insert(model):
+        objs = [model(**row) for row in rows]
+        session.add_all(objs)
+        await session.flush()
+        return objs
+    # Returned in parameter order, so callers can match rows to their inputs
+    result = await session.scalars(insert(model).returning(model, sort_by_parameter_order=True), rows)
+    return result.all()
+
+
+async def bulk_update(session, model, rows: Dict[str, dict]) -> list:
+    """
+    Apply per-row changes keyed by documentId.
+    Rows that set the same columns share one
+    `UPDATE ... FROM (VALUES ...) WHERE documentId = v.documentId RETURNING`.
+    """
+    if needs_orm_update(model):
+        # Fallback: load and mutate ORM objects so update listeners still run
+        result = await session.scalars(
+            select(model).where(model.documentId.in_(list(rows))))
+        objs = result.all()
+        for obj in objs:
+            for key, value in rows[obj.documentId].items():
+                setattr(obj, key, value)
+        await session.flush()
+        # Reload server-side onupdate values (updatedAt) in one query
+        result = await session.scalars(
+            select(model).where(model.documentId.in_([obj.documentId for obj in objs]))
+            .execution_options(populate_existing=True))
+        return result.all()
+
+    groups: Dict[tuple, list] = {}
+    for document_id, changes in rows.items():
+        groups.setdefault(tuple(sorted(changes)), []).append((document_id, changes))
+
+    updated = []
+    for keys, group in groups.items():
+        columns = [model.__table__.c[key] for key in keys]
+        data = values(
+            column("documentId", String),
+            *[column(col.key, col.type) for col in columns],
+            name="bulk_values",
+        ).data([(document_id, *[changes[key] for key in keys]) for document_id, changes in group])
+        statement = (
+            update(model)
+            .where(model.documentId == data.c.documentId)
+            .values({key: data.c[key] for key in keys})
+            .returning(model)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.scalars(statement)
+        updated.extend(result.all())
+    return updated
+
+
+async def bulk_delete(session, model, document_ids: List[str]) -> List[str]:
+    """
+    Delete rows with `DELETE ... WHERE documentId = ANY(:ids) RETURNING documentId`.
+    Returns the ids that were deleted.
+    """
+    if needs_orm_delete(model):
+        result = await session.scalars(
+            select(model).where(model.documentId.in_(document_ids)))
+        objs = result.all()
+        for obj in objs:
+            await session.delete(obj)
+        await session.flush()
+        return [obj.documentId for obj in objs]
+
+    result = await session.scalars(
+        delete(model)
+        .where(model.documentId == any_(bindparam("document_ids", document_ids, type_=ARRAY(String))))
+        .returning(model.documentId)
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
+
+
+async def update_one(session, model, document_id: str, data: dict):
+    """
+    Update one row by documentId and return the updated object, or None when
+    no row matched.
+
+    Runs a single `UPDATE ... WHERE documentId = :id RETURNING ...`. Models
+    with update listeners (User re-hashes its password in `before_update`)
+    can't use it since Core statements skip mapper events; they take the
+    ORM path instead: SELECT, mutate, flush, then refresh for updatedAt.
+    """
+    if needs_orm_update(model):
+        result = await session.scalars(select(model).where(model.documentId == document_id))
+        obj = result.one_or_none()
+        if obj is None:
+            return None
+        for key, value in data.items():
+            if hasattr(obj, key):
+                setattr(obj, key, value)
+        await session.flush()
+        await session.refresh(obj)
+        return obj
+
+    if not data:
+        result = await session.scalars(select(model).where(model.documentId == document_id))
+        return result.one_or_none()
+
+    result = await session.scalars(
+        update(model)
+        .where(model.documentId == document_id)
+        .values(**data)
+        .returning(model)
+        .execution_options(synchronize_session=False)
+    )
+    return result.one_or_none()
+
+
+async def delete_one(session, model, document_id: str) -> bool:
+    """
+    Delete one row by documentId with `DELETE ... RETURNING id`; False when
+    no row matched. Models with delete listeners go through the ORM.
+    """
+    if needs_orm_delete(model):
+        result = await session.scalars(select(model).where(model.documentId == document_id))
+        obj = result.one_or_none()
+        if obj is None:
+            return False
+        await session.delete(obj)
+        await session.flush()
+        return True
+
+    result = await session.execute(
+        delete(model)
+        .where(model.documentId == document_id)
+        .returning(model.id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none() is not None
@@ -0,0 +1,100 @@
+"""
+HTTP conditional GET for generated read routes. Validators come from the
+`updatedAt` column: a single row's timestamp, or `count(*)` and
+`max(updatedAt)` over a filtered set. Requests whose `If-None-Match` or
+`If-Modified-Since` still match are answered with `304 Not Modified` before
+any row is fetched or serialized. List routes whose count strategy is
+`estimated`, `cached` or `none`, and cursor pages, only compute the set
+validator for requests that carry a conditional header.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import select, func
+
+# Authenticated payloads: only the client may store them, and it must
+# revalidate on every use rather than guess freshness from Last-Modified
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag hashed from the representation's validator parts."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    # updatedAt is stored as naive server time (UTC)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def has_conditional_headers(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    RFC 9110 evaluation for GET: `If-None-Match` (weak comparison) wins;
+    `If-Modified-Since` is only consulted when it is absent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have one second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def variant_key(request: Request) -> tuple:
+    """Query parameters that shape the body, in a stable order."""
+    return tuple(sorted(request.query_params.multi_items()))
+
+
+async def row_validator(session, model, document_id: str):
+    """
+    `updatedAt` of one row; `None` when the row does not exist.
+    """
+    result = await session.execute(
+        select(model.updatedAt).where(model.documentId == document_id))
+    return result.first()
+
+
+async def set_validator(session, model, query, params: Optional[dict] = None):
+    """
+    (count, max(updatedAt)) over the rows matched by `query`, in one pass.
+    Any insert, update or delete in the set changes at least one of them.
+    """
+    subquery = query.order_by(None).with_only_columns(model.updatedAt).subquery()
+    result = await session.execute(
+        select(func.count(), func.max(subquery.c.updatedAt)), params)
+    count, last_modified = result.one()
+    return count, last_modified
@@ -0,0 +1,126 @@
+"""
+Batched by-key lookups. A DataLoader collects the keys requested while the
+current tasks run, deduplicates them and resolves them all with one batch
+call, so code that looks rows up one at a time (in a loop over results or
+across concurrent tasks) issues a single query:
+
+    users = document_loader(request, session, User)
+    owner, editor = await asyncio.gather(users.load(owner_id), users.load(editor_id))
+
+Loaders are cached per request on `request.state`, so a key is fetched at
+most once per request.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+from fastapi import Request
+from sqlalchemy import any_, bindparam, select
+from sqlalchemy.types import ARRAY
+
+
+async def fetch_by_document_ids(session, model, query, document_ids: List[str]) -> Dict[str, dict]:
+    """
+    Result mappings of `query` for the given ids, keyed by documentId. The
+    ids are bound as one array (`documentId = ANY(:ids)`), so the statement
+    is the same for any number of them.
+    """
+    ids = bindparam("document_ids", document_ids, type_=ARRAY(model.documentId.type))
+    result = await session.execute(
+        query.where(model.documentId == any_(ids)).add_columns(model.documentId.label("_document_id")))
+    rows = {}
+    for row in result.fetchall():
+        item = dict(row._mapping)
+        rows[item.pop("_document_id")] = item
+    return rows
+
+
+class DataLoader:
+    """
+    `batch_load(keys)` returns a dict of the values it found; keys missing
+    from it load as None. A failed batch fails every load waiting on it and
+    is not cached.
+    """
+
+    def __init__(self, batch_load: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 max_batch_size: int = 1000):
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._pending: List[Hashable] = []
+        # The loop only keeps weak references to running batches
+        self._tasks = set()
+
+    def load(self, key: Hashable) -> Awaitable[Optional[Any]]:
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            self._pending.append(key)
+            if len(self._pending) == 1:
+                # Runs after the tasks that are ready now have queued their keys
+                loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Optional[Any]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: Hashable, value: Any) -> None:
+        """Seed a value already at hand, e.g. a row loaded by another query."""
+        if key not in self._futures:
+            future = self._futures[key] = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+
+    def clear(self, key: Hashable) -> None:
+        self._futures.pop(key, None)
+
+    def _dispatch(self) -> None:
+        keys, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._resolve_all(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve_all(self, keys: List[Hashable]) -> None:
+        # One batch at a time: batch functions usually share a session
+        for start in range(0, len(keys), self.max_batch_size):
+            await self._resolve(keys[start:start + self.max_batch_size])
+
+    async def _resolve(self, keys: List[Hashable]) -> None:
+        try:
+            values = await self.batch_load(keys)
+        except Exception as e:
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._futures.get(key)
+            if future is not None and not future.done():
+                future.set_result(values.get(key))
+
+
+def request_loader(request: Request, name: Hashable,
+                   batch_load: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]) -> DataLoader:
+    """The request's DataLoader registered under `name`, created on first use."""
+    loaders = getattr(request.state, "loaders", None)
+    if loaders is None:
+        loaders = request.state.loaders = {}
+    loader = loaders.get(name)
+    if loader is None:
+        loader = loaders[name] = DataLoader(batch_load)
+    return loader
+
+
+def document_loader(request: Request, session, model) -> DataLoader:
+    """
+    Loads `model` instances by documentId on `session`. Document loaders of
+    different models take turns on the session, which cannot run two
+    statements at once.
+    """
+    lock = session.info.setdefault("loader_lock", asyncio.Lock())
+
+    async def batch_load(document_ids):
+        async with lock:
+            rows = await fetch_by_document_ids(session, model, select(model), document_ids)
+        return {document_id: next(iter(item.values())) for document_id, item in rows.items()}
+
+    return request_loader(request, ("documents", model.__tablename__), batch_load)
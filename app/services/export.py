@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+from datetime import datetime
+from app.core.database import read_session_factory
+from app.generator.schema import IST
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def _encode_value(value):
+    # Same datetime rendering as the generated response schemas
+    if isinstance(value, datetime):
+        return value.astimezone(IST).isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return _encode_value(value)
+    return str(value)
+
+
+def _ndjson_chunk(keys, rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(keys, row)), default=_json_default, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_encode_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+async def stream_export(query, params: dict, format: str, fetch_size: int, session_factory=None):
+    """
+    Stream the rows of `query` as NDJSON or CSV text chunks.
+    Uses a server-side cursor fetching `fetch_size` rows per round trip, so
+    memory stays flat regardless of the result size. The session lives
+    inside the generator because the response outlives the route's
+    dependencies. When the client disconnects, the response task is
+    cancelled and the cursor and session are closed on the way out.
+    """
+    async with (session_factory or read_session_factory())() as session:
+        result = await session.stream(
+            query, params, execution_options={"yield_per": fetch_size})
+        try:
+            keys = list(result.keys())
+            if format == "csv":
+                yield _csv_chunk([keys])
+            async for rows in result.partitions():
+                yield _csv_chunk(rows) if format == "csv" else _ndjson_chunk(keys, rows)
+        finally:
+            await result.close()
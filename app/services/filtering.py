@@ -1,6 +1,10 @@
-from sqlalchemy import and_, or_, cast, Integer, String, Float
+from sqlalchemy import and_, or_, cast, bindparam, Integer, String, Float
 from sqlalchemy.sql import operators
 from sqlalchemy.orm import Mapper
+from typing import Optional
+from app.utils.cache import TTLCache
+from app.core.metrics import FILTER_PARSE_ERRORS
+from app.services.search import SEARCH_OPERATOR, SEARCH_PARAM, get_search_config
 
 
 LOGICAL_OPERATORS = {
@@ -26,18 +30,74 @@ COMPARISON_OPERATORS = {
 }
 
 
-def parse_filters(model, filters):
+# Operators whose operand is rewritten into an ILIKE pattern
+PATTERN_OPERATORS = {
+    "$contains": "%{}%",
+    "$ncontains": "%{}%",
+    "$startswith": "{}%",
+    "$endswith": "%{}",
+}
+
+LIST_OPERATORS = {"$in", "$isanyof"}
+
+NULL_OPERATORS = {"$isempty", "$isnotempty"}
+
+# Compiled filter expressions keyed by (model, filter shape)
+filter_plan_cache = TTLCache(maxsize=1024)
+
+
+def _check_operand(key, column, operand):
+    # Validate operand type against column type
+    column_type = column.type
+    if isinstance(column_type, (Integer, Float)) and not isinstance(operand, (int, float)):
+        raise ValueError(
+            f"Type mismatch for field '{key}': Expected numeric, got '{operand}'"
+        )
+    if isinstance(column_type, String) and not isinstance(operand, str):
+        raise ValueError(
+            f"Type mismatch for field '{key}': Expected string, got '{operand}'"
+        )
+
+
+def _operand_kind(operator, operand):
     """
-    Recursively parse filters into SQLAlchemy expressions.
-    Includes error handling for type mismatches and ensures valid column types.
+    The part of an operand that changes the generated SQL, as opposed to
+    the value itself which is sent as a bind parameter.
     """
-    expressions = []
+    if operator in NULL_OPERATORS:
+        return "none"
+    if operator in LIST_OPERATORS:
+        return "list"
+    if operator in ("$eq", "$ne"):
+        # `null` and "" compare as IS [NOT] NULL, whatever the column type
+        if operand is None or operand == "":
+            return "null"
+        if isinstance(operand, str):
+            return "cast"
+    return "value"
+
+
+def filter_shape(model, filters, params: dict):
+    """
+    Validate a filter tree and split it into a hashable shape (structure,
+    fields, operators) and its values, which are collected into `params`
+    under the bind parameter names referenced by the shape.
+    """
+    nodes = []
     for key, value in filters.items():
         if key in LOGICAL_OPERATORS:  # Handle logical operators ($and, $or)
-            sub_expressions = [
-                parse_filters(model, sub_filter) for sub_filter in value
-            ]
-            expressions.append(LOGICAL_OPERATORS[key](*sub_expressions))
+            nodes.append((key, tuple(
+                filter_shape(model, sub_filter, params) for sub_filter in value
+            )))
+
+        elif key == SEARCH_OPERATOR:  # Full-text search over the model's search columns
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"'{SEARCH_OPERATOR}' expects a non-empty search string")
+            if SEARCH_PARAM in params:
+                raise ValueError(f"Only one '{SEARCH_OPERATOR}' is allowed per filter")
+            get_search_config(model)
+            params[SEARCH_PARAM] = value
+            nodes.append((key, SEARCH_PARAM))
 
         elif isinstance(value, dict):  # Handle comparison operators
             column = getattr(model, key, None)
@@ -49,23 +109,21 @@ def parse_filters(model, filters):
                     raise ValueError(f"Invalid operator '{operator}' for field '{key}'")
 
                 try:
-                    # Special handling for NULL-like checks
-                    if operator in ["$isempty", "$isnotempty"]:
-                        expressions.append(COMPARISON_OPERATORS[operator](column))
-                    else:
-                        # Validate operand type against column type
-                        column_type = column.type
-                        if isinstance(column_type, (Integer, Float)) and not isinstance(operand, (int, float)):
-                            raise ValueError(
-                                f"Type mismatch for field '{key}': Expected numeric, got '{operand}'"
-                            )
-                        if isinstance(column_type, String) and not isinstance(operand, str):
-                            raise ValueError(
-                                f"Type mismatch for field '{key}': Expected string, got '{operand}'"
-                            )
-
-                        # Apply the filter
-                        expressions.append(COMPARISON_OPERATORS[operator](column, operand))
+                    kind = _operand_kind(operator, operand)
+                    name = None
+                    if kind == "list":
+                        if not isinstance(operand, (list, tuple)):
+                            raise ValueError(f"Expected a list, got '{operand}'")
+                        for item in operand:
+                            _check_operand(key, column, item)
+                        name = f"filter_{len(params)}"
+                        params[name] = list(operand)
+                    elif kind in ("value", "cast"):
+                        _check_operand(key, column, operand)
+                        name = f"filter_{len(params)}"
+                        pattern = PATTERN_OPERATORS.get(operator)
+                        params[name] = pattern.format(operand) if pattern else operand
+                    nodes.append((key, operator, kind, name))
                 except Exception as e:
                     raise ValueError(
                         f"Error processing filter for field '{key}' with operator '{operator}': {e}"
@@ -73,5 +131,96 @@ def parse_filters(model, filters):
         else:
             raise ValueError(f"Invalid filter format for key '{key}': {value}")
 
+    if not nodes:
+        raise ValueError("Empty filter")
+    return tuple(nodes)
+
+
+def build_filter_expression(model, shape):
+    """
+    Build the SQLAlchemy expression for a filter shape, using bind
+    parameters in place of values so the statement can be reused.
+    """
+    expressions = []
+    for node in shape:
+        if node[0] == SEARCH_OPERATOR:
+            expressions.append(get_search_config(model).match())
+            continue
+
+        if node[0] in LOGICAL_OPERATORS:
+            key, sub_shapes = node
+            expressions.append(LOGICAL_OPERATORS[key](
+                *[build_filter_expression(model, sub_shape) for sub_shape in sub_shapes]
+            ))
+            continue
+
+        key, operator, kind, name = node
+        column = getattr(model, key)
+        if kind == "none":
+            expressions.append(COMPARISON_OPERATORS[operator](column))
+        elif kind == "null":
+            expressions.append(column.is_(None) if operator == "$eq" else column.is_not(None))
+        elif kind == "cast":
+            operand = cast(bindparam(name, type_=String()), column.type)
+            expressions.append(column == operand if operator == "$eq" else column != operand)
+        elif kind == "list":
+            expressions.append(column.in_(bindparam(name, type_=column.type, expanding=True)))
+        elif operator in PATTERN_OPERATORS:
+            pattern = column.ilike(bindparam(name, type_=String()))
+            expressions.append(~pattern if operator == "$ncontains" else pattern)
+        else:
+            expressions.append(COMPARISON_OPERATORS[operator](
+                column, bindparam(name, type_=column.type)))
+
     return and_(*expressions) if len(expressions) > 1 else expressions[0]
 
+
+def shape_fields(shape) -> set:
+    """Every column name referenced by a filter shape."""
+    fields = set()
+    for node in shape:
+        if node[0] in LOGICAL_OPERATORS:
+            for sub_shape in node[1]:
+                fields |= shape_fields(sub_shape)
+        elif node[0] != SEARCH_OPERATOR:
+            fields.add(node[0])
+    return fields
+
+
+def compile_filters(model, filters, allowed_fields: Optional[set] = None):
+    """
+    Parse filters into a parameterized SQLAlchemy expression.
+    Returns (expression, params); execute the statement with `params`.
+    Expressions are cached per model and filter shape, so requests that only
+    differ in values reuse the same statement (and its compiled form).
+    With `allowed_fields`, filters on any other column are rejected.
+    """
+    params = {}
+    try:
+        shape = filter_shape(model, filters, params)
+        if allowed_fields is not None:
+            rejected = shape_fields(shape) - allowed_fields
+            if rejected:
+                raise ValueError(
+                    f"Filtering on {', '.join(sorted(rejected))} is not allowed; "
+                    f"filterable fields: {', '.join(sorted(allowed_fields))}")
+    except (ValueError, TypeError, AttributeError):
+        FILTER_PARSE_ERRORS.labels(model.__name__).inc()
+        raise
+    key = (model, shape)
+    expression = filter_plan_cache.get(key)
+    if expression is None:
+        expression = build_filter_expression(model, shape)
+        filter_plan_cache.set(key, expression)
+    return expression, params
+
+
+def parse_filters(model, filters):
+    """
+    Recursively parse filters into SQLAlchemy expressions.
+    Includes error handling for type mismatches and ensures valid column types.
+    Values are bound into the returned expression; prefer `compile_filters`
+    on hot paths.
+    """
+    expression, params = compile_filters(model, filters)
+    return expression.params(params)
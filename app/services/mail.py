@@ -0,0 +1,202 @@
+"""
+Outgoing email delivery. Messages are rendered when they are queued and
+sent by a few workers, each holding one persistent SMTP connection that is
+reused across messages and closed after sitting idle. A worker drains up to
+`batch_size` queued messages per wake-up on its connection; failed sends
+are retried with exponential backoff.
+"""
+import asyncio
+import logging
+import random
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+from functools import lru_cache
+from typing import List, Optional, Set
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from fastapi_mail import ConnectionConfig
+from app.core.metrics import MAIL_QUEUE_DEPTH, MAIL_DELIVERY_LATENCY, MAIL_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+
+class MailQueueFull(Exception):
+    pass
+
+
+@lru_cache(maxsize=8)
+def template_environment(folder: str) -> Environment:
+    # Compiled templates are cached by the environment; no reload checks
+    return Environment(loader=FileSystemLoader(folder), autoescape=select_autoescape(),
+                       auto_reload=False)
+
+
+def render_template(folder: str, name: str, context: dict) -> str:
+    return template_environment(folder).get_template(name).render(**context)
+
+
+def build_message(conf: ConnectionConfig, recipients: List[str], subject: str, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((conf.MAIL_FROM_NAME or "", conf.MAIL_FROM))
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(html, subtype="html")
+    return message
+
+
+class OutgoingMail:
+    __slots__ = ("message", "attempts", "enqueued_at")
+
+    def __init__(self, message: EmailMessage):
+        self.message = message
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+
+def is_permanent(error: Exception) -> bool:
+    """5xx replies and refused recipients will fail the same way again."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, aiosmtplib.SMTPResponseException) and 500 <= error.code < 600
+
+
+class MailQueue:
+    def __init__(self, conf: ConnectionConfig, workers: int = 2, batch_size: int = 20,
+                 maxsize: int = 10000, max_retries: int = 5, retry_backoff: float = 2,
+                 idle_timeout: float = 30):
+        self.conf = conf
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.TimerHandle] = set()
+        MAIL_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+    def enqueue(self, message: EmailMessage) -> None:
+        if self.conf.SUPPRESS_SEND:
+            return
+        try:
+            self.queue.put_nowait(OutgoingMail(message))
+        except asyncio.QueueFull:
+            MAIL_MESSAGES.labels("rejected").inc()
+            raise MailQueueFull("Mail queue is full")
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Give queued mail `timeout` seconds to go out, then stop the workers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping mail workers with %d emails still queued", self.queue.qsize())
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        conf = self.conf
+        smtp = aiosmtplib.SMTP(
+            hostname=conf.MAIL_SERVER, port=conf.MAIL_PORT, timeout=conf.TIMEOUT,
+            use_tls=conf.MAIL_SSL_TLS, start_tls=conf.MAIL_STARTTLS, validate_certs=conf.VALIDATE_CERTS)
+        await smtp.connect()
+        if conf.USE_CREDENTIALS:
+            await smtp.login(conf.MAIL_USERNAME, conf.MAIL_PASSWORD.get_secret_value())
+        return smtp
+
+    async def _close(self, smtp: Optional[aiosmtplib.SMTP]) -> None:
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _worker(self) -> None:
+        smtp = None
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    # Idle: hand the connection back rather than wait for the server to drop it
+                    await self._close(smtp)
+                    smtp = None
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                try:
+                    smtp = await self._send_batch(smtp, batch)
+                except Exception:
+                    # A bug must not stop the queue from draining; start over on a new connection
+                    logger.exception("Mail worker failed on a batch of %d emails", len(batch))
+                    await self._close(smtp)
+                    smtp = None
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+        finally:
+            await self._close(smtp)
+
+    async def _send_batch(self, smtp: Optional[aiosmtplib.SMTP], batch: List[OutgoingMail]):
+        for index, mail in enumerate(batch):
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self.connect()
+                try:
+                    await smtp.send_message(mail.message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # The server closed the pooled connection; reconnect once
+                    smtp = await self.connect()
+                    await smtp.send_message(mail.message)
+            except (aiosmtplib.SMTPException, OSError) as e:
+                if not is_permanent(e):
+                    # Connection-level failure: the rest of the batch would fail too
+                    if smtp is not None:
+                        smtp.close()
+                    smtp = None
+                    for pending in batch[index:]:
+                        self._retry(pending, e)
+                    return smtp
+                self._retry(mail, e)
+                continue
+            except Exception:
+                # Not a delivery failure (e.g. a message that can't be encoded); retrying won't help
+                MAIL_MESSAGES.labels("failed").inc()
+                logger.exception("Dropping email to %s", mail.message["To"])
+                continue
+            MAIL_MESSAGES.labels("sent").inc()
+            MAIL_DELIVERY_LATENCY.observe(time.monotonic() - mail.enqueued_at)
+        return smtp
+
+    def _retry(self, mail: OutgoingMail, error: Exception) -> None:
+        mail.attempts += 1
+        if is_permanent(error) or mail.attempts > self.max_retries:
+            MAIL_MESSAGES.labels("failed").inc()
+            logger.error("Giving up on email to %s after %d attempts: %s",
+                         mail.message["To"], mail.attempts, error)
+            return
+        MAIL_MESSAGES.labels("retried").inc()
+        delay = self.retry_backoff * 2 ** (mail.attempts - 1) * random.uniform(0.5, 1.5)
+        logger.warning("Email to %s failed (%s), retrying in %.1fs", mail.message["To"], error, delay)
+        handle = None
+
+        def requeue():
+            self._retries.discard(handle)
+            try:
+                self.queue.put_nowait(mail)
+            except asyncio.QueueFull:
+                MAIL_MESSAGES.labels("rejected").inc()
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retries.add(handle)
@@ -0,0 +1,145 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import tuple_, literal, select, func, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.utils.cache import TTLCache
+
+COUNT_STRATEGIES = ("exact", "estimated", "cached", "none")
+
+# Totals for the `cached` strategy, keyed by table and normalized filters
+count_cache = TTLCache(maxsize=4096)
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    """
+    Encode the sort key and id tie-breaker of a row into an opaque cursor token.
+    """
+    if isinstance(sort_value, (datetime, date)):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, column):
+    """
+    Decode a cursor token back into (sort_value, id), coercing the sort value
+    to the python type of the sort column.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        row_id = int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if sort_value is None:
+        raise ValueError(
+            "Cursor pagination requires a sort field without NULL values")
+
+    python_type = column.type.python_type
+    if python_type is datetime and isinstance(sort_value, str):
+        sort_value = datetime.fromisoformat(sort_value)
+    elif python_type is date and isinstance(sort_value, str):
+        sort_value = date.fromisoformat(sort_value)
+    elif not isinstance(sort_value, python_type):
+        try:
+            sort_value = python_type(sort_value)
+        except (ValueError, TypeError):
+            raise ValueError("Cursor does not match the sort field")
+    return sort_value, row_id
+
+
+def keyset_condition(column, id_column, sort_value, row_id, ascending: bool):
+    """
+    Build the row-value seek predicate `(sort_col, id) > (:value, :id)`
+    (or `<` for descending order) so the page is read straight from the index.
+    """
+    left = tuple_(column, id_column)
+    right = tuple_(literal(sort_value, column.type),
+                   literal(row_id, id_column.type))
+    return left > right if ascending else left < right
+
+
+class explain(Executable, ClauseElement):
+    """
+    `EXPLAIN (FORMAT JSON) <statement>` keeping the statement's bind parameters.
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def exact_count(session, query, params: Optional[dict] = None) -> int:
+    total_result = await session.execute(
+        select(func.count()).select_from(query.order_by(None).subquery()), params)
+    return total_result.scalar()
+
+
+async def estimated_count(session, model, query, params: Optional[dict] = None) -> Optional[int]:
+    """
+    Row estimate from planner statistics: `pg_class.reltuples` for the whole
+    table, or the planner's row estimate for a filtered query (one with a
+    WHERE clause, which may have no bound values, e.g. `$isempty`).
+    Returns None when no usable statistics exist.
+    """
+    if query.whereclause is None:
+        result = await session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": model.__tablename__},
+        )
+        estimate = result.scalar()
+        # reltuples is -1 (or 0 on older servers) until the table is analyzed
+        return estimate if estimate and estimate > 0 else None
+
+    result = await session.execute(explain(query.order_by(None)), params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_records(session, model, query, strategy: str, params: Optional[dict] = None,
+                        filters_key: Optional[str] = None, ttl: float = 60):
+    """
+    Count the rows matched by `query` using the configured strategy.
+    Returns (total_records, strategy_used); `strategy_used` differs from
+    `strategy` when an estimate is unavailable and an exact count was done.
+    """
+    if strategy == "estimated":
+        try:
+            # Savepoint so a failed estimate does not abort the page query
+            async with session.begin_nested():
+                estimate = await estimated_count(session, model, query, params)
+        except Exception:
+            estimate = None
+        if estimate is not None:
+            return estimate, "estimated"
+        return await exact_count(session, query, params), "exact"
+
+    if strategy == "cached":
+        key = (model.__tablename__, filters_key)
+        total_records = count_cache.get(key)
+        if total_records is None:
+            total_records = await exact_count(session, query, params)
+            count_cache.set(key, total_records, ttl=ttl)
+        return total_records, "cached"
+
+    return await exact_count(session, query, params), "exact"
+
+
+def normalize_filters(parsed_filters) -> Optional[str]:
+    """
+    Stable string form of a parsed filter tree, used as a cache key.
+    """
+    if not parsed_filters:
+        return None
+    return json.dumps(parsed_filters, sort_keys=True, separators=(",", ":"))
@@ -0,0 +1,69 @@
+"""
+Relationship loading for the generated read routes. No relationship is
+loaded unless asked for: `include=role` eager-loads relationships listed
+under `includable` in the model config, and `fields=` accepts their columns
+as dotted paths (`fields=username,role.name`).
+
+    "includable": ["role"],
+"""
+from typing import List, Optional, Tuple
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return list(dict.fromkeys(part.strip() for part in (value or "").split(",") if part.strip()))
+
+
+def relationship_property(model, name: str, includable: set):
+    relationship = inspect(model).relationships.get(name)
+    if relationship is None or name not in includable:
+        raise ValueError(
+            f"Cannot include '{name}'; includable relationships: {', '.join(sorted(includable)) or 'none'}")
+    return relationship
+
+
+def parse_include(model, include: Optional[str], includable: set) -> Tuple[str, ...]:
+    names = _split(include)
+    for name in names:
+        relationship_property(model, name, includable)
+    return tuple(names)
+
+
+def loader_options(model, names: Tuple[str, ...]) -> list:
+    """
+    A LEFT JOIN for many-to-one relationships; a second `SELECT ... IN` for
+    collections, which would multiply (and mis-paginate) the parent rows
+    if joined.
+    """
+    options = []
+    for name in names:
+        attribute = getattr(model, name)
+        uselist = inspect(model).relationships[name].uselist
+        options.append(selectinload(attribute) if uselist else joinedload(attribute))
+    return options
+
+
+def projected_columns(model, fields: Optional[str], includable: set):
+    """
+    Columns for a `fields=` projection and the many-to-one relationships to
+    outer join for its dotted paths. Unknown plain names are skipped, as before.
+    """
+    mapper = inspect(model)
+    columns, joins = [], []
+    for name in _split(fields):
+        relation, _, field = name.partition(".")
+        if not field:
+            if name in mapper.columns:
+                columns.append(getattr(model, name))
+            continue
+        relationship = relationship_property(model, relation, includable)
+        if relationship.uselist:
+            raise ValueError(f"Cannot project '{name}'; '{relation}' is a collection, use include={relation}")
+        target = relationship.mapper
+        if field not in target.columns:
+            raise ValueError(f"Unknown field '{name}'")
+        columns.append(getattr(target.class_, field).label(name))
+        if relation not in joins:
+            joins.append(relation)
+    return columns, joins
@@ -0,0 +1,108 @@
+"""
+Full-text search for generated routes. A model opts in through the
+`search` entry of its config:
+
+    "search": {
+        "columns": {"username": "A", "email": "B"},   # or a list, all weight A
+        "language": "simple",
+        "trigram": ["username", "email"],             # GIN indexes for ILIKE
+    }
+
+`{"$search": "quick fox"}` in a filter matches the columns' tsvector against
+`websearch_to_tsquery`; the same expression backs the GIN index declared in
+app/core/indexes.py, so the planner can use it.
+"""
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import String, Index, func, text, bindparam
+from app.core.config import settings
+
+SEARCH_OPERATOR = "$search"
+SEARCH_PARAM = "search_query"
+
+WEIGHTS = ("A", "B", "C", "D")
+
+_IDENTIFIER = re.compile(r"^[a-z_]+$")
+
+
+class SearchConfig:
+    """The tsvector document and query expressions of one model."""
+
+    def __init__(self, model, columns, language: Optional[str] = None, trigram: List[str] = ()):
+        if isinstance(columns, (list, tuple)):
+            columns = {name: "A" for name in columns}
+        if not columns:
+            raise ValueError(f"Search for {model.__name__} needs at least one column")
+        language = language or settings.search_language
+        if not _IDENTIFIER.match(language):
+            raise ValueError(f"Invalid search language '{language}'")
+        for name in [*columns, *trigram]:
+            column = model.__table__.c.get(name)
+            if column is None or not isinstance(column.type, String):
+                raise ValueError(f"Search column '{name}' of {model.__name__} must be a string column")
+        for weight in columns.values():
+            if weight not in WEIGHTS:
+                raise ValueError(f"Invalid search weight '{weight}'; use one of {WEIGHTS}")
+
+        self.model = model
+        self.columns = columns
+        self.trigram = list(trigram)
+        # Literals rather than bind parameters: the query expression has to
+        # match the index expression for the planner to use the index
+        self.language = text(f"'{language}'::regconfig")
+        self.document = self._document()
+
+    def _document(self):
+        document = None
+        for name, weight in self.columns.items():
+            vector = func.to_tsvector(
+                self.language, func.coalesce(self.model.__table__.c[name], text("''")))
+            if len(self.columns) > 1:
+                vector = func.setweight(vector, text(f"'{weight}'"))
+            document = vector if document is None else document.op("||")(vector)
+        return document
+
+    def query(self):
+        return func.websearch_to_tsquery(self.language, bindparam(SEARCH_PARAM, type_=String()))
+
+    def match(self):
+        return self.document.op("@@")(self.query())
+
+    def rank(self):
+        return func.ts_rank_cd(self.document, self.query())
+
+    def indexes(self) -> List[Index]:
+        """Attach the GIN indexes not yet on the table and return them."""
+        table = self.model.__table__
+        existing = {index.name for index in table.indexes}
+        indexes = []
+        name = f"ix_{table.name}_search"
+        if name not in existing:
+            indexes.append(Index(name, self.document, postgresql_using="gin"))
+        for column in self.trigram:
+            name = f"ix_{table.name}_{column}_trgm"
+            if name not in existing:
+                indexes.append(Index(name, table.c[column], postgresql_using="gin",
+                                     postgresql_ops={column: "gin_trgm_ops"},
+                                     info={"extension": "pg_trgm"}))
+        return indexes
+
+
+search_configs: Dict[type, SearchConfig] = {}
+
+
+def register_search(model, config: dict) -> Optional[SearchConfig]:
+    """Read the `search` entry of a model config, if any."""
+    search = config.get("search")
+    if not search:
+        return None
+    search_configs[model] = SearchConfig(
+        model, search["columns"], search.get("language"), search.get("trigram", []))
+    return search_configs[model]
+
+
+def get_search_config(model) -> SearchConfig:
+    try:
+        return search_configs[model]
+    except KeyError:
+        raise ValueError(f"Search is not enabled for {model.__name__}")
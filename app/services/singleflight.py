@@ -0,0 +1,52 @@
+"""
+Request coalescing for read routes: concurrent calls with the same key
+share one in-flight execution and its result.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+from fastapi import Response
+from app.core.metrics import SINGLE_FLIGHT_REQUESTS
+
+
+class SingleFlight:
+    """
+    The first caller for a key (the leader) starts the work as a task; callers
+    arriving while it runs await the same task. The task is shielded, so a
+    leader whose client disconnects does not cancel it for the others, and
+    it must not depend on the leader's request scope (open its own session).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is None:
+            SINGLE_FLIGHT_REQUESTS.labels(self.name, "executed").inc()
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            SINGLE_FLIGHT_REQUESTS.labels(self.name, "coalesced").inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so an abandoned failure isn't logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+def clone_response(response: Response) -> Response:
+    """
+    A copy of a shared response for one request: middleware may edit the
+    header list of the response it sends in place.
+    """
+    copy = Response(response.body, status_code=response.status_code)
+    copy.raw_headers = list(response.raw_headers)
+    return copy
@@ -1,7 +1,9 @@
 from pydantic import BaseModel, EmailStr
 from typing import List
 from fastapi import HTTPException, BackgroundTasks
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from fastapi_mail import ConnectionConfig
+from app.core.config import settings
+from app.services.mail import MailQueue, MailQueueFull, build_message, render_template
 import os
 
 class EmailSchema(BaseModel):
@@ -24,17 +26,28 @@ conf = ConnectionConfig(
     TEMPLATE_FOLDER=template_folder_path
 )
 
+# Started and drained by the application lifespan
+mail_queue = MailQueue(
+    conf,
+    workers=settings.mail_workers,
+    batch_size=settings.mail_batch_size,
+    maxsize=settings.mail_queue_size,
+    max_retries=settings.mail_max_retries,
+    retry_backoff=settings.mail_retry_backoff,
+    idle_timeout=settings.mail_idle_timeout,
+)
+
 async def send_email(background_tasks: BackgroundTasks, email: List[str], subject: str, body: str,token:str):
+    """
+    Render the email now and queue it for the mail workers.
+    `background_tasks` is unused and kept for existing callers.
+    """
     try:
-        message = MessageSchema(
-            subject=subject,
-            recipients=email,  # Ensure recipients is a list
-            template_body={"token":token,"username":body.username},  # Ensure body is a string
-            subtype="html"
-        )
-        
-        fm = FastMail(conf)
-        background_tasks.add_task(
-            fm.send_message, message, template_name='email.html')
+        html = render_template(template_folder_path, "email.html",
+                               {"token": token, "username": body.username})
+        mail_queue.enqueue(build_message(conf, email, subject, html))
+    except MailQueueFull:
+        raise HTTPException(status_code=503, detail="Email service is busy, please try again later",
+                            headers={"Retry-After": "5"})
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
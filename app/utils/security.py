@@ -1,13 +1,23 @@
+import asyncio
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt
 from pydantic import BaseModel
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.core.database import get_read_session
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+from app.core.database import auth_session_factory, master_db_engine
+from app.services.batch import BATCH_PRINCIPAL
+from app.core.config import settings
+from app.utils.cache import TTLCache
+from app.core.metrics import AUTH_FAILURES
 
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
@@ -18,15 +28,196 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 http_bearer = HTTPBearer()
 
+logger = logging.getLogger(__name__)
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
+class Principal(BaseModel):
+    """
+    The authenticated user as seen by auth checks; safe to cache.
+    get_current_user returns this rather than the ORM User: routes that
+    need other columns or relationships load the row with `load_user`.
+    """
+    documentId: str
+    username: str
+    email: Optional[str] = None
+    role_id: Optional[str] = None
+    is_active: bool
+    is_block: bool
+    role_name: Optional[str] = None
+
+    async def load_user(self, session: AsyncSession):
+        """The full User row (with its role), or None if it was deleted."""
+        return await get_user(self.documentId, session)
+
+# Resolved principals keyed by token subject (User.documentId). Entries are
+# only used while `principal_invalidations` is listening, so a write in one
+# worker reaches the others; the TTL bounds staleness for writes made
+# outside the API.
+principal_cache = TTLCache(maxsize=settings.principal_cache_maxsize,
+                           ttl=settings.principal_cache_ttl)
+# Bumped on every invalidation so a lookup racing a write is not cached
+_principal_cache_generation = 0
+
+PRINCIPAL_CHANNEL = "principal_cache"
+
+def _drop_principals(model_name: str, document_id: Optional[str]):
+    global _principal_cache_generation
+    _principal_cache_generation += 1
+    if model_name == "User" and document_id:
+        principal_cache.pop(document_id)
+    else:
+        principal_cache.clear()
+
+def invalidate_principal_cache(model, document_id: Optional[str] = None):
+    """
+    Drop cached principals affected by a write to `model`, here and in the
+    other workers. A User write drops that user (or everyone without an
+    id); a Role write drops everyone, since role names are part of every
+    principal.
+    """
+    model_name = getattr(model, "__name__", model)
+    if model_name not in ("User", "Role"):
+        return
+    _drop_principals(model_name, document_id)
+    principal_invalidations.publish(model_name, document_id)
+
+class PrincipalInvalidations:
+    """
+    Shares principal cache invalidations between worker processes with
+    Postgres NOTIFY on the master. Each worker keeps one master connection
+    LISTENing; while it is down (not started, or reconnecting) the cache is
+    bypassed, since invalidations from other workers could be missed.
+    """
+
+    def __init__(self, engine, heartbeat: float = 5):
+        self.engine = engine
+        self.heartbeat = heartbeat
+        self.origin = uuid.uuid4().hex
+        self.listening = False
+        self._task: Optional[asyncio.Task] = None
+        self._notifications = set()
+
+    def publish(self, model_name: str, document_id: Optional[str]):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._notify(f"{self.origin}:{model_name}:{document_id or ''}"))
+        # The loop only keeps weak references to tasks
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+
+    async def _notify(self, payload: str):
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                   {"channel": PRINCIPAL_CHANNEL, "payload": payload})
+                await conn.commit()
+        except Exception:
+            logger.warning("Could not publish principal cache invalidation %s", payload, exc_info=True)
+
+    def _received(self, connection, pid, channel, payload: str):
+        origin, _, rest = payload.partition(":")
+        if origin == self.origin:
+            return
+        model_name, _, document_id = rest.partition(":")
+        _drop_principals(model_name, document_id or None)
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    closed = asyncio.Event()
+                    driver.add_termination_listener(lambda _: closed.set())
+                    await driver.add_listener(PRINCIPAL_CHANNEL, self._received)
+                    try:
+                        # Entries cached before now may have missed invalidations
+                        principal_cache.clear()
+                        self.listening = True
+                        while not closed.is_set():
+                            try:
+                                await asyncio.wait_for(closed.wait(), self.heartbeat)
+                            except asyncio.TimeoutError:
+                                # Notices a connection that died without closing. Run on the
+                                # driver: SQLAlchemy would open a transaction, and Postgres
+                                # holds back notifications from sessions inside one
+                                await asyncio.wait_for(driver.execute("SELECT 1"), self.heartbeat)
+                    finally:
+                        self.listening = False
+                        # Never hand a LISTENing connection back to the pool
+                        await conn.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Principal cache invalidation listener lost its connection; retrying",
+                               exc_info=True)
+            await asyncio.sleep(self.heartbeat)
+
+    def start(self) -> None:
+        if self._task is None and settings.principal_cache_enabled:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.gather(*self._notifications, return_exceptions=True)
+
+# Started and stopped by the application lifespan
+principal_invalidations = PrincipalInvalidations(master_db_engine)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def is_password_hash(value: str) -> bool:
+    """True if `value` is already a hash produced by pwd_context."""
+    return pwd_context.identify(value) is not None
+
+class PasswordHasherBusy(HTTPException):
+    """Raised when the password hashing queue is full."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+# bcrypt is CPU bound and releases the GIL, so it runs on a small dedicated
+# thread pool instead of blocking the event loop for 100-300ms per call
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+_password_jobs = 0
+
+async def run_password_job(fn, *args):
+    """
+    Run a hashing call on the password pool. Rejects with 503 once the
+    running plus queued jobs exceed the workers plus PASSWORD_HASH_QUEUE_SIZE.
+    """
+    global _password_jobs
+    if _password_jobs >= settings.password_hash_workers + settings.password_hash_queue_size:
+        raise PasswordHasherBusy()
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+    finally:
+        _password_jobs -= 1
+
+async def verify_password_async(plain_password, hashed_password):
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await run_password_job(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -40,28 +231,55 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 async def get_user(user_id: str, session: AsyncSession):
     # Local import to avoid circular dependency
     from app.api.auth.user.model import User
-    result = await session.execute(select(User).where(User.documentId == user_id))
+    # The profile response includes the role
+    result = await session.execute(
+        select(User).options(joinedload(User.role)).where(User.documentId == user_id))
     user = result.scalar_one_or_none()
     return user
 
+async def load_principal(user_id: str, session: AsyncSession) -> Optional[Principal]:
+    from app.api.auth.user.model import User
+    from app.api.auth.role.model import Role
+    result = await session.execute(
+        select(User.documentId, User.username, User.email, User.role_id, User.is_active, User.is_block,
+               Role.name.label("role_name"))
+        .outerjoin(Role, Role.documentId == User.role_id)
+        .where(User.documentId == user_id)
+    )
+    row = result.one_or_none()
+    return Principal(**row._mapping) if row else None
+
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
-    session: AsyncSession = Depends(get_read_session)
 ):
-    from app.api.auth.user.model import User
     token = credentials.credentials
+    # Sub-requests of POST /api/_batch reuse the principal the batch resolved for this token
+    resolved = getattr(request.state, BATCH_PRINCIPAL, None)
+    if resolved is not None and resolved[0] == token:
+        return resolved[1]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])         
         user_id: str = payload.get("documentId")
         if user_id is None:
+            AUTH_FAILURES.labels("missing_subject").inc()
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="UserId not found in token",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        query = await session.execute(select(User).where(User.documentId == user_id))
-        user = query.scalar_one_or_none()
+        use_cache = settings.principal_cache_enabled and principal_invalidations.listening
+        user = principal_cache.get(user_id) if use_cache else None
+        if user is None:
+            generation = _principal_cache_generation
+            # A session of its own, closed as soon as the lookup is done,
+            # instead of a connection held for the rest of the request
+            async with auth_session_factory(request)() as session:
+                user = await load_principal(user_id, session)
+            if user is not None and use_cache and generation == _principal_cache_generation:
+                principal_cache.set(user_id, user)
         if user is None:
+            AUTH_FAILURES.labels("unknown_user").inc()
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
@@ -69,6 +287,7 @@ async def get_current_user(
             )
         return user
     except jwt.JWTError:
+        AUTH_FAILURES.labels("invalid_token").inc()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid Token",
@@ -77,7 +296,11 @@ async def get_current_user(
 
 async def get_current_active_user(current_user=Depends(get_current_user)):
     if not current_user.is_active:
+        AUTH_FAILURES.labels("inactive_user").inc()
         raise HTTPException(status_code=400, detail="Inactive user")
+    if current_user.is_block:
+        AUTH_FAILURES.labels("blocked_user").inc()
+        raise HTTPException(status_code=403, detail="Blocked user")
     return current_user
 
 def get_current_active_user_with_roles(required_roles: list[str]):
@@ -87,7 +310,8 @@ def get_current_active_user_with_roles(required_roles: list[str]):
         return allow_all_users
     else:
         async def _get_current_active_user_with_roles(current_user=Depends(get_current_active_user)):
-            if current_user.role.name not in required_roles:
+            if current_user.role_name not in required_roles:
+                AUTH_FAILURES.labels("forbidden").inc()
                 raise HTTPException(status_code=403, detail="Not enough permissions")
             return current_user
         return _get_current_active_user_with_roles
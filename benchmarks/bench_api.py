@@ -0,0 +1,335 @@
+"""
+Scenario load tests for the generated CRUD API against a database filled by
+`benchmarks.datagen --admin`. Each scenario is run by `concurrency` closed-loop
+clients for `duration` seconds and reported as throughput and p50/p95/p99
+latency; `--output` writes the results with the git commit they were taken
+at, and `compare` diffs two such files.
+
+    python -m benchmarks.bench_api [--mode asgi|uvicorn] [--scenarios a,b]
+                                   [--concurrency 20] [--duration 20] [--output run.json]
+    python -m benchmarks.bench_api compare base.json run.json
+
+`asgi` drives the app in-process through httpx's ASGI transport (no network
+or server overhead); `uvicorn` starts a real server process. Scenarios:
+
+    deep_offset    GET /api/users at page --deep-page with OFFSET pagination
+    deep_cursor    walks GET /api/users page by page with keyset cursors
+    filters        nested $and/$or filter over string and boolean columns
+    projection     GET /api/users?fields=... (column subset)
+    bulk_writes    POST /api/roles/bulk with --bulk-size new roles per request
+    creates        POST /api/roles, one new role per request (see `group_commit`)
+    login_storm    POST /api/users/login (bcrypt verification per request)
+
+bulk_writes and creates leave their rows behind; point it at a benchmark database only.
+They send explicit role ids (the create schema requires them) from ROLE_ID_BASE up,
+far above what the id sequence hands out to other inserts.
+
+A scenario with failed requests (status >= 400) is reported on stderr and
+makes the run exit with status 1; `compare` flags it, since its timings
+are not those of the intended work.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.datagen import ADMIN_EMAIL, BENCH_PASSWORD
+
+ROLE_ID_BASE = 1_000_000_000
+
+COMPLEX_FILTER = json.dumps({
+    "$and": [
+        {"$or": [{"username": {"$contains": "1"}}, {"email": {"$startswith": "a"}}]},
+        {"is_active": {"$eq": True}},
+        {"$or": [{"is_block": {"$eq": False}}, {"username": {"$endswith": "7"}}]},
+    ]
+})
+
+
+class Scenario:
+    """One request per call; may keep per-client state (e.g. a cursor)."""
+
+    def __init__(self, options):
+        self.options = options
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        """Runs once before the scenario's clients start."""
+
+    def client_state(self) -> dict:
+        return {}
+
+    async def __call__(self, client: httpx.AsyncClient, state: dict) -> httpx.Response:
+        raise NotImplementedError
+
+
+class DeepOffset(Scenario):
+    async def __call__(self, client, state):
+        return await client.get("/api/users", params={"page": self.options.deep_page, "size": 50})
+
+
+class DeepCursor(Scenario):
+    async def __call__(self, client, state):
+        params = {"pagination": "cursor", "size": 50}
+        if state.get("cursor"):
+            params["after"] = state["cursor"]
+        response = await client.get("/api/users", params=params)
+        if response.status_code == 200:
+            meta = response.json().get("meta", {})
+            # Start over at the end of the table
+            state["cursor"] = meta.get("next_cursor")
+        return response
+
+
+class Filters(Scenario):
+    async def __call__(self, client, state):
+        return await client.get("/api/users", params={"filters": COMPLEX_FILTER, "size": 50})
+
+
+class Projection(Scenario):
+    async def __call__(self, client, state):
+        return await client.get("/api/users", params={"fields": "documentId,username,email", "size": 100})
+
+
+class RoleWrites(Scenario):
+    """Creates roles with ids counting up from above the highest existing one."""
+
+    async def setup(self, client):
+        response = await client.get("/api/roles", params={"sort": "id:desc", "size": 1, "fields": "id"})
+        response.raise_for_status()
+        rows = response.json()["data"]
+        self.role_ids = itertools.count(max(rows[0]["id"] if rows else 0, ROLE_ID_BASE) + 1)
+
+    def role(self) -> dict:
+        return {"id": next(self.role_ids), "name": f"bench-{secrets.token_hex(8)}"}
+
+
+class BulkWrites(RoleWrites):
+    async def __call__(self, client, state):
+        return await client.post("/api/roles/bulk", json=[self.role() for _ in range(self.options.bulk_size)])
+
+
+class Creates(RoleWrites):
+    async def __call__(self, client, state):
+        return await client.post("/api/roles", json=self.role())
+
+
+class LoginStorm(Scenario):
+    async def __call__(self, client, state):
+        return await client.post("/api/users/login", json={"email": ADMIN_EMAIL, "password": BENCH_PASSWORD})
+
+
+SCENARIOS = {
+    "deep_offset": DeepOffset,
+    "deep_cursor": DeepCursor,
+    "filters": Filters,
+    "projection": Projection,
+    "bulk_writes": BulkWrites,
+    "creates": Creates,
+    "login_storm": LoginStorm,
+}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies, statuses, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    errors = sum(1 for status in statuses if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): statuses.count(status) for status in sorted(set(statuses))},
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        "mean_ms": (statistics.fmean(latencies) if latencies else 0.0) * 1000,
+    }
+
+
+async def run_scenario(client, scenario: Scenario, concurrency: int, duration: float, warmup: float) -> dict:
+    latencies, statuses = [], []
+    recording = False
+
+    async def worker():
+        state = scenario.client_state()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = (await scenario(client, state)).status_code
+            except httpx.HTTPError:
+                status = 599
+            if recording:
+                latencies.append(time.perf_counter() - start)
+                statuses.append(status)
+
+    # Unrecorded warm-up: fills pools and caches first
+    deadline = time.perf_counter() + warmup
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    recording = True
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def login(client) -> str:
+    response = await client.post("/api/users/login", json={"email": ADMIN_EMAIL, "password": BENCH_PASSWORD})
+    if response.status_code != 200:
+        raise SystemExit(f"Login as {ADMIN_EMAIL} failed ({response.status_code}): {response.text}; "
+                         "run `python -m benchmarks.datagen --admin` first")
+    return response.json()["access_token"]
+
+
+async def run_all(client, options) -> dict:
+    token = await login(client)
+    client.headers["Authorization"] = f"Bearer {token}"
+    results = {}
+    for name in options.scenarios:
+        scenario = SCENARIOS[name](options)
+        await scenario.setup(client)
+        result = await run_scenario(client, scenario, options.concurrency, options.duration, options.warmup)
+        results[name] = result
+        print(f"{name:<12} {result['throughput']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  "
+              f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+              f"errors {result['errors']}/{result['requests']}", flush=True)
+        if result["errors"]:
+            print(f"WARNING: {name} had {result['errors']} failed requests (statuses {result['statuses']}); "
+                  "its timings do not measure the intended work", file=sys.stderr, flush=True)
+    return results
+
+
+async def run_asgi(options) -> dict:
+    from main import app
+
+    # ASGITransport does not run the lifespan; the app's startup work is needed
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_all(client, options)
+
+
+async def wait_until_up(client, process, timeout: float = 30) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"uvicorn exited with status {process.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("uvicorn did not come up")
+
+
+async def run_uvicorn(options) -> dict:
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(options.port),
+        "--workers", str(options.workers), "--log-level", "warning", "--no-access-log"])
+    try:
+        limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{options.port}", limits=limits,
+                                     timeout=60) as client:
+            await wait_until_up(client, process)
+            return await run_all(client, options)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def git_commit() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def run(options) -> None:
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}; have {', '.join(SCENARIOS)}")
+    runner = run_asgi if options.mode == "asgi" else run_uvicorn
+    results = asyncio.run(runner(options))
+    if options.output:
+        report = {
+            **git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "mode": options.mode,
+            "concurrency": options.concurrency,
+            "duration": options.duration,
+            "workers": options.workers if options.mode == "uvicorn" else None,
+            "scenarios": results,
+        }
+        with open(options.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"wrote {options.output}")
+    failed = [name for name, result in results.items() if result["errors"]]
+    if failed:
+        raise SystemExit(f"Scenarios with failed requests: {', '.join(failed)}")
+
+
+def change(base: float, new: float) -> str:
+    return f"{(new - base) / base * 100:+6.1f}%" if base else "    n/a"
+
+
+def compare(base_path: str, new_path: str) -> None:
+    """Per-scenario deltas between two `--output` files; latency up or throughput down is worse."""
+    with open(base_path) as base_file, open(new_path) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    print(f"base {str(base.get('commit'))[:12]}{' (dirty)' if base.get('dirty') else ''}  "
+          f"new {str(new.get('commit'))[:12]}{' (dirty)' if new.get('dirty') else ''}")
+    if (base.get("mode"), base.get("concurrency")) != (new.get("mode"), new.get("concurrency")):
+        print("warning: runs used different modes or concurrency")
+    for name in [name for name in base["scenarios"] if name in new["scenarios"]]:
+        old, current = base["scenarios"][name], new["scenarios"][name]
+        if old["errors"] or current["errors"]:
+            print(f"WARNING: {name} had failed requests (base {old['errors']}/{old['requests']}, "
+                  f"new {current['errors']}/{current['requests']}); its deltas are not meaningful",
+                  file=sys.stderr)
+        print(f"{name:<12} throughput {current['throughput']:9.1f} req/s "
+              f"{change(old['throughput'], current['throughput'])}  " + "  ".join(
+                  f"{key[:-3]} {current[key]:8.2f} ms {change(old[key], current[key])}"
+                  for key in ("p50_ms", "p95_ms", "p99_ms")))
+
+
+def main(argv) -> None:
+    if argv[:1] == ["compare"]:
+        if len(argv) != 3:
+            raise SystemExit("usage: python -m benchmarks.bench_api compare base.json new.json")
+        return compare(argv[1], argv[2])
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [name for name in value.split(",") if name])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3, help="unrecorded seconds before each scenario")
+    parser.add_argument("--deep-page", type=int, default=1000, help="page number for deep_offset")
+    parser.add_argument("--bulk-size", type=int, default=100, help="items per bulk_writes request")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--output", help="write the results as JSON")
+    run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+"""
+Insert throughput and index size of random versus time-ordered documentIds.
+Each generator fills its own scratch table shaped like the documentId
+column (String(24), unique) in batches of single-statement multi-row
+INSERTs, then reports rows/s and the size of the unique index; the tables
+are dropped afterwards.
+
+    python -m benchmarks.bench_document_ids [rows] [batch]
+
+Uses the master database URL from the environment / .env.
+"""
+import asyncio
+import sys
+import time
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import random_document_id, time_ordered_document_id
+from benchmarks.datagen import asyncpg_dsn
+
+GENERATORS = {
+    "random": random_document_id,
+    "time_ordered": time_ordered_document_id,
+}
+
+
+async def fill(connection, table: str, generate, rows: int, batch: int) -> float:
+    await connection.execute(f'DROP TABLE IF EXISTS {table}')
+    await connection.execute(
+        f'CREATE TABLE {table} (id serial PRIMARY KEY, "documentId" varchar(24) NOT NULL UNIQUE)')
+    insert = f'INSERT INTO {table} ("documentId") SELECT unnest($1::varchar[])'
+    started = time.perf_counter()
+    for offset in range(0, rows, batch):
+        await connection.execute(insert, [generate() for _ in range(min(batch, rows - offset))])
+    return time.perf_counter() - started
+
+
+async def main(rows: int = 1_000_000, batch: int = 100):
+    connection = await asyncpg.connect(asyncpg_dsn(settings.postgresql_database_master_url))
+    try:
+        for name, generate in GENERATORS.items():
+            table = f"bench_document_ids_{name}"
+            elapsed = await fill(connection, table, generate, rows, batch)
+            index_bytes = await connection.fetchval(
+                "SELECT pg_relation_size(indexrelid) FROM pg_index "
+                "WHERE indrelid = $1::regclass AND NOT indisprimary", table)
+            await connection.execute(f"DROP TABLE {table}")
+            print(f"{name:<13} {rows / elapsed:10,.0f} rows/s  "
+                  f"documentId index {index_bytes / 2 ** 20:8.1f} MiB")
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
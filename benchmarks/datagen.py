@@ -0,0 +1,170 @@
+"""
+Synthetic data for the benchmarks: fills every registered model (or the ones
+named) with `rows` rows each, in foreign key order, using COPY. Values are
+derived from the column types; unique columns carry a per-run prefix so the
+generator can be run repeatedly against the same database, and all password
+columns share one precomputed hash of BENCH_PASSWORD.
+
+    python -m benchmarks.datagen --rows 100000 [--models users,roles] [--admin]
+
+Uses the master database URL from the environment / .env; start the app
+once first so the tables and indexes exist. `--admin` also creates the
+admin role and an admin user (ADMIN_EMAIL / BENCH_PASSWORD) that the
+scenario runner logs in as.
+"""
+import argparse
+import asyncio
+import random
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, JSON, Numeric, String, Text
+
+from app.api import *  # noqa: F401,F403 - registers the models
+from app.core.config import settings
+from app.core.database import Base
+from app.generator.models import get_models
+from app.utils.security import get_password_hash
+
+ADMIN_EMAIL = "bench-admin@example.com"
+BENCH_PASSWORD = "bench-password"
+ADMIN_ROLE = "admin"
+
+# Generated values span the last year
+SPAN = timedelta(days=365)
+
+
+def asyncpg_dsn(url: str) -> str:
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class ColumnGenerator:
+    """Builds a value for row `i` of one column, from its name and type."""
+
+    def __init__(self, column, run: str, password_hash: str, references=None):
+        self.column = column
+        self.run = run
+        self.password_hash = password_hash
+        self.references = references
+
+    def __call__(self, i: int, now: datetime):
+        column = self.column
+        name = column.name
+        if self.references is not None:
+            return random.choice(self.references)
+        if name == "documentId":
+            return f"{self.run}{i:018x}"
+        if name in ("createdAt", "updatedAt"):
+            return now
+        if name == "password":
+            return self.password_hash
+        if column.nullable and column.default is None and name in ("createdBy", "updatedBy"):
+            return None
+        column_type = column.type
+        if isinstance(column_type, Boolean):
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            # Mostly the default, so filters on flags have realistic selectivity
+            return default if default is not None and random.random() < 0.9 else random.random() < 0.5
+        if isinstance(column_type, Integer):
+            return random.randint(0, 1_000_000)
+        if isinstance(column_type, (Float, Numeric)):
+            return round(random.uniform(0, 1000), 2)
+        if isinstance(column_type, DateTime):
+            return now
+        if isinstance(column_type, Date):
+            return now.date()
+        if isinstance(column_type, JSON):
+            return "{}"
+        if isinstance(column_type, (String, Text)):
+            if "email" in name.lower():
+                return f"{self.run}.{i}@bench.example.com"
+            value = f"{name}-{self.run}-{i}" if column.unique else f"{name}-{random.randint(0, 9999)}"
+            return value[:column_type.length] if column_type.length else value
+        if column.nullable:
+            return None
+        raise ValueError(f"No generator for {column.table.name}.{name} ({column_type})")
+
+
+async def referenced_values(connection, column, limit: int = 100_000) -> list:
+    (foreign_key,) = column.foreign_keys
+    target = foreign_key.column
+    values = await connection.fetch(
+        f'SELECT "{target.name}" FROM "{target.table.name}" LIMIT {limit}')
+    if not values:
+        raise RuntimeError(f"{column.table.name}.{column.name} references the empty table "
+                           f"{target.table.name}; generate it first")
+    return [value[0] for value in values]
+
+
+async def fill_table(connection, table, rows: int, run: str, password_hash: str, batch_size: int) -> None:
+    # The serial primary key is left to the database
+    columns = [column for column in table.columns if not (column.primary_key and column.autoincrement)]
+    generators = []
+    for column in columns:
+        references = await referenced_values(connection, column) if column.foreign_keys else None
+        generators.append(ColumnGenerator(column, run, password_hash, references))
+
+    started = time.perf_counter()
+    # Timestamps are stored as naive UTC
+    end = datetime.now(timezone.utc).replace(tzinfo=None)
+    for offset in range(0, rows, batch_size):
+        records = []
+        for i in range(offset, min(offset + batch_size, rows)):
+            now = end - SPAN * random.random()
+            records.append(tuple(generate(i, now) for generate in generators))
+        await connection.copy_records_to_table(
+            table.name, records=records, columns=[column.name for column in columns])
+        print(f"\r{table.name}: {offset + len(records)}/{rows}", end="", flush=True)
+    elapsed = time.perf_counter() - started
+    print(f"\r{table.name}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+async def create_admin(connection, password_hash: str) -> None:
+    """The admin role and user the scenarios authenticate as, if missing."""
+    role_id = await connection.fetchval('SELECT "documentId" FROM roles WHERE name = $1', ADMIN_ROLE)
+    if role_id is None:
+        role_id = secrets.token_hex(12)
+        await connection.execute(
+            'INSERT INTO roles ("documentId", name) VALUES ($1, $2)', role_id, ADMIN_ROLE)
+    await connection.execute(
+        'INSERT INTO users ("documentId", username, email, password, is_active, is_block, role_id) '
+        "VALUES ($1, $2, $3, $4, true, false, $5) ON CONFLICT (email) DO NOTHING",
+        secrets.token_hex(12), "bench-admin", ADMIN_EMAIL, password_hash, role_id)
+    print(f"admin user: {ADMIN_EMAIL} / {BENCH_PASSWORD}")
+
+
+async def main(rows: int, models: list, admin: bool, batch_size: int) -> None:
+    tables = {model.__tablename__ for model in get_models()}
+    if models:
+        unknown = set(models) - tables
+        if unknown:
+            raise SystemExit(f"Unknown models: {', '.join(sorted(unknown))}; have {', '.join(sorted(tables))}")
+        tables = set(models)
+
+    # One bcrypt hash for every generated row; hashing per row would take hours
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    run = secrets.token_hex(3)
+    connection = await asyncpg.connect(asyncpg_dsn(settings.postgresql_database_master_url))
+    try:
+        if admin:
+            await create_admin(connection, password_hash)
+        for table in Base.metadata.sorted_tables:
+            if table.name in tables:
+                await fill_table(connection, table, rows, run, password_hash, batch_size)
+        for table in tables:
+            await connection.execute(f'ANALYZE "{table}"')
+    finally:
+        await connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows per model")
+    parser.add_argument("--models", default="", help="comma-separated table names (default: all)")
+    parser.add_argument("--admin", action="store_true", help="create the benchmark admin user")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, [name for name in args.models.split(",") if name], args.admin,
+                     args.batch_size))
@@ -1,22 +1,44 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from app.core.database import master_db_engine, Base
+from app.core.database import master_db_engine, replica_set, Base, ReadYourWritesMiddleware, document_id_generator
 from fastapi.middleware.cors import CORSMiddleware
 from app.error.exception_handlers import error_exception_handlers, http_exception_handlers
 from app.generator.routers import generate_crud_router
 from app.generator.schema import generate_schemas
 from app.generator.models import get_models
 from app.api import *
-from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from fastapi.responses import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from app.core.metrics import PrometheusMiddleware, setup_metrics
+from app.core.profiling import QueryProfilingMiddleware, setup_profiling
+from app.core.admission import AdmissionControlMiddleware
+from app.services.aggregation import aggregatable_fields
+from app.core.indexes import declare_indexes, ensure_extensions, query_field_whitelist, verify_indexes
 from fastapi.staticfiles import StaticFiles
 from app.api.upload import upload
+from app.api import batch
+from app.utils.email import mail_queue
+from app.utils.security import principal_invalidations
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Fail before serving rather than on the first insert
+    document_id_generator()
     async with master_db_engine.begin() as conn:
+        await conn.run_sync(ensure_extensions, settings.index_check)
         await conn.run_sync(Base.metadata.create_all)
+    # create_all only builds indexes with new tables; check existing ones
+    await verify_indexes(master_db_engine, Base.metadata.sorted_tables, settings.index_check)
+    replica_set.start()
+    principal_invalidations.start()
+    mail_queue.start()
     yield
+    await mail_queue.stop()
+    await principal_invalidations.stop()
+    await replica_set.stop()
+    await master_db_engine.dispose()
 
 app = FastAPI(lifespan=lifespan,
               title="SucceedEx Placements and Training API", version="0.1.0")
@@ -28,6 +50,10 @@ http_exception_handlers(app)
 # Serve static files
 app.mount("/public", StaticFiles(directory="public"), name="public")
 
+# Shed load with 503 while the database pools are saturated; inside CORS so
+# rejections still carry the CORS headers
+app.add_middleware(AdmissionControlMiddleware, router=app.router)
+
 # CORS settings
 origins = ["*"]
 app.add_middleware(
@@ -38,6 +64,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Pin clients to the master for a short window after they write
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Per-request SQL profiling: Server-Timing headers, slow query and N+1 logs
+if settings.query_profiling_enabled:
+    setup_profiling()
+    app.add_middleware(QueryProfilingMiddleware)
+
+# Prometheus request, pool and query instrumentation
+setup_metrics()
+app.add_middleware(PrometheusMiddleware)
+
 
 @app.get("/", tags=["Root"])
 def read_root():
@@ -48,11 +86,12 @@ def read_root():
 def health_check():
     return {"status": True}
 
-@app.get("/metrics")
+@app.get("/metrics", include_in_schema=False)
 def get_metrics():
-    return PlainTextResponse("Running")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 app.include_router(upload.router)
+app.include_router(batch.router)
 
 # Dynamically generate and include routers for all models
 models = get_models()
@@ -63,8 +102,22 @@ for model in models:
     config = model_configs.get(model_name, {})
     required_roles = config.get("required_roles", {})
     custom_routes = config.get("custom_routes", [])
+    declare_indexes(model, config)
+    filterable, sortable = query_field_whitelist(model, config, settings.strict_query_fields)
     router = generate_crud_router(
-        model, schemas, required_roles, custom_routes)
+        model, schemas, required_roles, custom_routes,
+        count_strategy=config.get("count_strategy", "exact"),
+        count_cache_ttl=config.get("count_cache_ttl", 60),
+        bulk_max_items=config.get("bulk_max_items", settings.bulk_max_items),
+        before_write=config.get("before_write"),
+        conditional_get=config.get("conditional_get", settings.conditional_get),
+        filterable=filterable,
+        sortable=sortable,
+        aggregatable=aggregatable_fields(config),
+        concurrency_limits=config.get("concurrency_limits"),
+        single_flight=config.get("single_flight", settings.single_flight),
+        includable=set(config.get("includable", [])),
+        group_commit=config.get("group_commit", False))
     app.include_router(router, prefix=f"/api/{model.__tablename__}")
 
 